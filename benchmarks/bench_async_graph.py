@@ -0,0 +1,85 @@
+"""
+Throughput of the sync graph (one session after another) vs. the async graph (all sessions on one event loop).
+
+Every LLM role is served by `FakeChatModel` (fixture `fixtures/cube.json`) with a fixed simulated latency, and
+retrieval uses an in-memory stand-in for the knowledge base. Program exec (sandboxed worker pool), export and
+screenshot rendering are real: each session writes into its own run directory, so concurrent sessions don't clobber
+each other's files. What is measured is how well LLM waits overlap with each other and with the CPU-bound stages.
+
+- python -m benchmarks.bench_async_graph
+- python -m benchmarks.bench_async_graph --sessions 32 --latency 0.5 --exec-workers 4
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+import graph.nodes as nodes
+from graph.fakes import install_fake_provider, load_fixture
+from graph.graph import build_async_graph, build_graph
+from graph.sandbox import get_execution_pool
+from langchain_core.messages import HumanMessage
+
+FIXTURE = Path(__file__).parent / "fixtures" / "cube.json"
+
+
+class _InMemoryKB:
+    @staticmethod
+    def retrieve(design_instructions, k_docs, k_examples):
+        return {"docs": [], "examples": []}
+
+    @staticmethod
+    def format_context(retrieved):
+        return "=== CADQUERY API REFERENCE ===\ncq.Workplane.box(length, width, height)"
+
+
+def install_fakes(latency: float) -> None:
+    install_fake_provider(load_fixture(FIXTURE), latency=latency)
+    nodes.setup_or_initialize_kb = lambda **kwargs: _InMemoryKB()
+
+
+def new_session(i: int) -> dict:
+    return {"messages": [HumanMessage(content=f"a cube with 20mm sides (session {i})")]}
+
+
+def run_sync(sessions: int) -> float:
+    graph = build_graph()
+    start = time.perf_counter()
+    for i in range(sessions):
+        graph.invoke(new_session(i), {"recursion_limit": 20})
+    return time.perf_counter() - start
+
+
+async def run_async(sessions: int) -> float:
+    graph = build_async_graph()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(graph.ainvoke(new_session(i), {"recursion_limit": 20})
+                                     for i in range(sessions)))
+    assert len({r["output_dir"] for r in results}) == sessions, "sessions shared a run directory"
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.25, help="simulated seconds per LLM call")
+    parser.add_argument("--exec-workers", type=int, default=2, help="sandboxed execution worker processes")
+    args = parser.parse_args()
+
+    install_fakes(args.latency)
+    pool = get_execution_pool(min_workers=args.exec_workers)
+    pool.wait_ready()
+
+    sync_s = run_sync(args.sessions)
+    async_s = asyncio.run(run_async(args.sessions))
+
+    print(f"{args.sessions} sessions, {args.latency:.2f}s per LLM call, {args.exec_workers} exec workers\n")
+    print(f"{'mode':<10}{'wall s':>10}{'sessions/s':>12}")
+    print(f"{'sync':<10}{sync_s:>10.2f}{args.sessions / sync_s:>12.2f}")
+    print(f"{'async':<10}{async_s:>10.2f}{args.sessions / async_s:>12.2f}")
+    print(f"\nspeedup: {sync_s / async_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
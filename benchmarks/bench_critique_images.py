@@ -0,0 +1,59 @@
+"""
+Payload of the critique images per encoding: layout (per-view tiles or 2x2 composite), color vs. grayscale and format,
+with the encode time and the estimated image tokens, next to the old base64 composite PNG pasted into the prompt.
+
+Meshes are trimesh primitives: a sphere (smooth shading), and a plate of cylinders (many edges and small features).
+
+- python -m benchmarks.bench_critique_images
+- python -m benchmarks.bench_critique_images --detail high --size 768
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import time
+
+import numpy as np
+import trimesh
+
+from graph.critique_images import encode_views, view_size, views_tokens
+from utils.generate_screenshots import IMAGE_FORMATS, render_labelled_views, render_views
+
+
+def cylinder_plate() -> trimesh.Trimesh:
+    parts = [trimesh.creation.box(extents=(100, 60, 5))]
+    for x in np.linspace(-40, 40, 5):
+        for y in np.linspace(-20, 20, 3):
+            parts.append(trimesh.creation.cylinder(radius=4, height=12, sections=48,
+                                                   transform=trimesh.transformations.translation_matrix((x, y, 8))))
+    return trimesh.util.concatenate(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=512, help="px per view, before the detail's cap")
+    parser.add_argument("--detail", default="low", choices=["low", "high", "auto"])
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args()
+
+    meshes = {"sphere": trimesh.creation.icosphere(4), "cylinder plate": cylinder_plate()}
+    for mesh_name, mesh in meshes.items():
+        old = render_views(mesh, dpi=80)
+        print(f"\n{mesh_name}: old base64 composite in the prompt: {len(base64.b64encode(old)) / 1024:.1f} KB of text")
+        print(f"{'layout':>10}{'gray':>6}{'format':>15}{'KB':>8}{'ms':>7}{'tokens':>8}")
+        for layout in ("views", "composite"):
+            views = render_labelled_views(mesh, view_size(args.size, layout, args.detail))
+            for grayscale in (False, True):
+                for fmt in ("auto", *IMAGE_FORMATS):
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        images = encode_views(views, layout, fmt, args.quality, grayscale)
+                    encode_ms = (time.perf_counter() - start) * 1000
+                    print(f"{layout:>10}{'yes' if grayscale else 'no':>6}{fmt:>15}"
+                          f"{sum(map(len, images.values())) / 1024:>8.1f}{encode_ms:>7.0f}"
+                          f"{views_tokens(images, args.detail):>8}")
+
+
+if __name__ == "__main__":
+    main()
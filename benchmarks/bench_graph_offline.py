@@ -0,0 +1,80 @@
+"""
+End-to-end run of the real graph with no network: every LLM role is served from a fixture by `FakeChatModel` and
+the knowledge base is built with `FakeEmbeddings` in a scratch directory. Program exec, export and screenshot
+rendering are real, so their cost shows up next to graph overhead in the per-node trace summary.
+
+- python -m benchmarks.bench_graph_offline
+- python -m benchmarks.bench_graph_offline --fixture benchmarks/fixtures/flange_repair.json --sessions 5 \
+    --latency 0.8 --jitter 0.4 --distribution lognormal
+- python -m benchmarks.bench_graph_offline --fixture benchmarks/fixtures/gate_repair.json
+  (the first program is 20mm short: the critique gate rejects it and sends it back for repair)
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from graph.critique_gate import get_gate_stats
+from graph.exec_cache import get_execution_cache
+from graph.render_cache import get_render_cache
+from graph.fakes import Latency, install_fake_provider, load_fixture
+from graph.graph import build_graph
+from graph.sandbox import get_execution_pool
+from langchain_core.messages import HumanMessage
+from utils.tracing import TraceHandler, load_spans, summarize
+from vector_db import CadQueryKnowledgeBase
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+EXAMPLES_DIR = Path(__file__).parents[1] / "cadquery_info" / "cq_examples"
+
+
+def build_knowledge_base(vector_db_dir: str) -> None:
+    CadQueryKnowledgeBase.VECTOR_DB_DIR = vector_db_dir
+    kb = CadQueryKnowledgeBase()
+    kb.ingest_examples(str(EXAMPLES_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=str(FIXTURES_DIR / "cube.json"))
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean simulated seconds per LLM call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--distribution", default="fixed", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency = Latency(mean=args.latency, jitter=args.jitter, distribution=args.distribution)
+    fixture = load_fixture(args.fixture)
+
+    with tempfile.TemporaryDirectory(prefix="bench-offline-") as tmp:
+        pool = get_execution_pool()  # pre-fork, as main.py does: workers warm up while the KB is built
+        install_fake_provider(fixture, latency=latency, seed=args.seed)
+        build_knowledge_base(str(Path(tmp) / "chroma"))
+
+        pool.wait_ready()
+
+        graph = build_graph()
+        traces = []
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            # fresh fakes per session so scripted replies start over
+            install_fake_provider(fixture, latency=latency, seed=args.seed + i)
+            tracer = TraceHandler(run_id=f"offline-{i}", trace_dir=str(Path(tmp) / "traces"))
+            graph.invoke({"messages": [HumanMessage(content=f"design session {i}")]},
+                         {"recursion_limit": 20, "callbacks": [tracer]})
+            traces.append(str(tracer.path))
+        wall_s = time.perf_counter() - start
+
+        print(f"\n{args.sessions} sessions from {Path(args.fixture).name} in {wall_s:.2f}s "
+              f"({latency.distribution} LLM latency, mean {latency.mean:.2f}s)\n")
+        print(summarize(load_spans(traces)))
+        print(f"\nexecution pool: {pool.stats()}")
+        print(f"execution cache: {get_execution_cache().stats()}")
+        print(f"render cache: {get_render_cache().stats()}")
+        print(f"critique gate: {get_gate_stats().stats()}")
+
+
+if __name__ == "__main__":
+    main()
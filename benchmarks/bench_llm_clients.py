@@ -0,0 +1,91 @@
+"""
+Per-call overhead of building a `ChatOpenAI` per node call vs. pulling it from the pooled registry.
+
+Runs against a local OpenAI-compatible stub, so the numbers are pure client overhead (model construction, connection
+setup, request/response handling) with no model latency. The pooled model is built with the response cache off, so
+every call reaches the stub and the modes compare connection handling only. The stub speaks plain HTTP; against the
+real API every extra connection also pays a TLS handshake, so the savings there are larger than shown here.
+
+- python -m benchmarks.bench_llm_clients
+- python -m benchmarks.bench_llm_clients --calls 500
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import Callable, List
+
+import httpx
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from benchmarks.openai_stub import OpenAIStubServer
+from graph.llm import configure_llm, get_llm, reset_llm_registry
+
+MESSAGES = [HumanMessage(content="a cube with 20mm sides")]
+
+
+def fresh_model(base_url: str) -> ChatOpenAI:
+    """What the nodes used to do: a brand-new model on every call."""
+    return ChatOpenAI(model="gpt-4.1", temperature=0.0, base_url=base_url)
+
+
+def fresh_model_and_connection(base_url: str) -> ChatOpenAI:
+    """Worst case: a new model *and* a new HTTP client (older langchain-openai, or per-call client settings)."""
+    return ChatOpenAI(model="gpt-4.1", temperature=0.0, base_url=base_url,
+                      http_client=httpx.Client(), http_async_client=httpx.AsyncClient())
+
+
+def pooled_model(base_url: str) -> ChatOpenAI:
+    return get_llm("dimensions")
+
+
+def run(stub: OpenAIStubServer, make_llm: Callable[[str], ChatOpenAI], calls: int) -> dict:
+    # warm-up call so import/first-connection costs are not attributed to a mode
+    make_llm(stub.base_url).invoke(MESSAGES)
+    stub.reset_stats()
+
+    timings: List[float] = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        make_llm(stub.base_url).invoke(MESSAGES)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    return {
+        "mean_ms": 1e3 * statistics.fmean(timings),
+        "p50_ms": 1e3 * timings[len(timings) // 2],
+        "p95_ms": 1e3 * timings[int(len(timings) * 0.95) - 1],
+        "connections": stub.connections,
+        "requests": stub.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+    with OpenAIStubServer(reply='{"object_type": "cube"}') as stub:
+        configure_llm("dimensions", base_url=stub.base_url, cache=False)
+
+        modes = {
+            "fresh ChatOpenAI per call": fresh_model,
+            "fresh ChatOpenAI + connection": fresh_model_and_connection,
+            "pooled registry": pooled_model,
+        }
+
+        print(f"{args.calls} calls per mode against {stub.base_url}\n")
+        print(f"{'mode':<32}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'conns':>8}")
+        for name, make_llm in modes.items():
+            r = run(stub, make_llm, args.calls)
+            print(f"{name:<32}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['connections']:>8}")
+
+        reset_llm_registry()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Render time of the 2x2 ISO / FRONT / TOP / SIDE composite: the NumPy z-buffer rasterizer (`render_views`) vs. the
+original matplotlib `plot_trisurf` renderer (`render_views_matplotlib`), across mesh sizes.
+
+Meshes are icospheres (20 * 4^n triangles). matplotlib is skipped above `--max-mpl-triangles`, where a single render
+takes minutes. The NumPy path decimates meshes above `--triangle-budget` first, as the graph does (0: never). The
+default sweep reaches 327,680 triangles (subdivision 7), the size where decimation pays off: about 16x there with the
+budget, 9x without it (vs. 4-8x up to subdivision 6, where the budget doesn't apply).
+
+- python -m benchmarks.bench_render
+- python -m benchmarks.bench_render --subdivisions 2 3 4 5 6 7 --dpi 150 --repeat 3
+- python -m benchmarks.bench_render --subdivisions 6 7 --triangle-budget 0
+"""
+
+import argparse
+import time
+
+import trimesh
+
+from utils.decimate import RENDER_TRIANGLE_BUDGET
+from utils.generate_screenshots import render_views, render_views_matplotlib
+
+
+def best_of(render, mesh, repeat: int, **kwargs) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(mesh, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subdivisions", type=int, nargs="+", default=[2, 3, 4, 5, 6, 7])
+    parser.add_argument("--dpi", type=int, default=80,
+                        help="of the 12x12 inch composite (80: about the 480 px views the critique used to get)")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N renders per mesh")
+    parser.add_argument("--max-mpl-triangles", type=int, default=400_000)
+    parser.add_argument("--triangle-budget", type=int, default=RENDER_TRIANGLE_BUDGET)
+    args = parser.parse_args()
+
+    render_views(trimesh.creation.icosphere(1), dpi=args.dpi)  # warm-up (imports, font loading)
+
+    print(f"composite at dpi {args.dpi}, best of {args.repeat}, triangle budget {args.triangle_budget or 'off'}\n")
+    print(f"{'triangles':>10}{'matplotlib s':>14}{'numpy s':>10}{'speedup':>10}")
+    for n in args.subdivisions:
+        mesh = trimesh.creation.icosphere(subdivisions=n)
+        numpy_s = best_of(render_views, mesh, args.repeat, dpi=args.dpi, triangle_budget=args.triangle_budget)
+        if len(mesh.faces) <= args.max_mpl_triangles:
+            mpl_s = best_of(render_views_matplotlib, mesh, 1 if len(mesh.faces) > 20_000 else args.repeat, dpi=args.dpi)
+            print(f"{len(mesh.faces):>10}{mpl_s:>14.3f}{numpy_s:>10.3f}{mpl_s / numpy_s:>9.1f}x")
+        else:
+            print(f"{len(mesh.faces):>10}{'skipped':>14}{numpy_s:>10.3f}{'':>10}")
+
+
+if __name__ == "__main__":
+    main()
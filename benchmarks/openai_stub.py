@@ -0,0 +1,140 @@
+"""
+Minimal OpenAI-compatible HTTP server for benchmarks.
+
+Answers `POST /v1/chat/completions` with a canned completion (streamed as server-sent events when the request asks
+for `stream`) and counts the TCP connections it accepts, so a benchmark can tell whether the client reused its
+keep-alive pool or reconnected on every call.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _ChatCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        request = json.loads(body or b"{}")
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.stats_lock:
+            self.server.requests += 1
+
+        if request.get("stream"):
+            self._stream_reply(request)
+            return
+
+        payload = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.server.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_reply(self, request: dict):
+        """Server-sent events, a few characters per chunk, like the real streaming API."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        reply = self.server.reply
+        created = int(time.time())
+        try:
+            for i in range(0, len(reply), 4):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": reply[i:i + 4]}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                if self.server.token_latency:
+                    time.sleep(self.server.token_latency)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client aborted the stream
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenAIStubServer:
+    """
+    Run the stub in a background thread:
+
+        with OpenAIStubServer(reply='{"object_type": "cube"}') as stub:
+            ChatOpenAI(base_url=stub.base_url, api_key="stub", ...)
+    """
+
+    def __init__(self, reply: str = "ok", latency: float = 0.0, token_latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _ChatCompletionHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.reply = reply
+        self.httpd.latency = latency
+        self.httpd.token_latency = token_latency
+        self.httpd.stats_lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def connections(self) -> int:
+        return self.httpd.connections
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    def reset_stats(self) -> None:
+        with self.httpd.stats_lock:
+            self.httpd.connections = 0
+            self.httpd.requests = 0
+
+    def start(self) -> "OpenAIStubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,298 @@
+"""
+Static check of generated programs against the installed CadQuery API.
+
+Walks the program AST, tracks which names hold a `cq.Workplane` / `cq.Sketch`, and checks every method chain on
+them (plus `cq.*` / `cq.exporters.*` references) against a table introspected from `cadquery` itself: invented
+methods, wrong arity and unknown keywords are reported with their line before the program is executed. Receivers
+whose type isn't known statically are not checked, so the pass never rejects a program that would run.
+"""
+
+import ast
+import difflib
+import inspect
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, TypeVar
+
+import cadquery
+import cadquery.occ_impl.exporters as cq_exporters
+
+CHAIN_TYPES = {"Workplane": cadquery.Workplane, "Sketch": cadquery.Sketch}
+
+
+@dataclass
+class _Member:
+    signature: Optional[inspect.Signature]  # None: not a method, or overloaded (`multimethod`)
+    returns: Optional[str]  # chain type the method returns, if any
+
+
+@dataclass
+class LintIssue:
+    line_no: int
+    kind: str  # the exception the call would raise: AttributeError / TypeError
+    message: str
+
+
+def _returns(annotation, cls_name: str) -> Optional[str]:
+    if isinstance(annotation, TypeVar) or annotation in (cls_name, CHAIN_TYPES[cls_name]):  # `-> T` is self
+        return cls_name
+    for name, cls in CHAIN_TYPES.items():
+        if annotation in (name, cls):
+            return name
+    return None
+
+
+@lru_cache(maxsize=None)
+def api_table() -> Dict[str, Dict[str, _Member]]:
+    table = {}
+    for name, cls in CHAIN_TYPES.items():
+        members = {attr: _Member(None, None) for attr in dir(cls()) if not attr.startswith("__")}  # + instance attrs
+        for attr in members:
+            static = inspect.getattr_static(cls, attr, None)
+            if not inspect.isfunction(static):
+                continue
+            signature = inspect.signature(static)
+            members[attr] = _Member(signature, _returns(signature.return_annotation, name))
+        table[name] = members
+    return table
+
+
+@lru_cache(maxsize=None)
+def _constructor(name: str) -> inspect.Signature:
+    return inspect.signature(CHAIN_TYPES[name])
+
+
+@lru_cache(maxsize=None)
+def _module_members() -> Dict[str, Set[str]]:
+    return {"cadquery": set(dir(cadquery)), "exporters": set(dir(cq_exporters))}
+
+
+def _did_you_mean(name: str, candidates) -> str:
+    close = difflib.get_close_matches(name, [c for c in candidates if not c.startswith("_")], n=3)
+    return f"; did you mean {', '.join(repr(c) for c in close)}?" if close else ""
+
+
+def _arity_error(signature: inspect.Signature, call: ast.Call, bound_self: bool) -> Optional[str]:
+    if any(isinstance(a, ast.Starred) for a in call.args) or any(k.arg is None for k in call.keywords):
+        return None  # *args / **kwargs: unknown at this point
+    args = ([None] if bound_self else []) + [None] * len(call.args)
+    try:
+        signature.bind(*args, **{k.arg: None for k in call.keywords})
+    except TypeError as e:
+        return str(e)
+    return None
+
+
+class _Linter(ast.NodeVisitor):
+    def __init__(self):
+        self.table = api_table()
+        self.modules = {"cq": "cadquery"}  # `cq` is always in the exec globals
+        self.names: Dict[str, Optional[str]] = {}  # variable -> chain type
+        self.plugins: Dict[str, Set[str]] = {name: set() for name in CHAIN_TYPES}  # `cq.Workplane.foo = ...`
+        self.issues: Dict[tuple, LintIssue] = {}
+        self._types: Dict[int, Optional[str]] = {}
+
+    def report(self, node: ast.AST, kind: str, message: str) -> None:
+        self.issues.setdefault((node.lineno, message), LintIssue(node.lineno, kind, message))
+
+    # ----------------------------
+    # what an expression refers to
+    # ----------------------------
+    def module_of(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return self.modules.get(node.id)
+        if isinstance(node, ast.Attribute) and node.attr == "exporters" and self.module_of(node.value) == "cadquery":
+            return "exporters"
+        return None
+
+    def chain_class(self, func: ast.AST) -> Optional[str]:
+        """`cq.Workplane` / `cq.Sketch` (or an imported alias), called to start a chain."""
+        if isinstance(func, ast.Attribute) and self.module_of(func.value) == "cadquery" and func.attr in CHAIN_TYPES:
+            return func.attr
+        if isinstance(func, ast.Name) and self.modules.get(func.id, "").startswith("cadquery."):
+            name = self.modules[func.id].split(".", 1)[1]
+            return name if name in CHAIN_TYPES else None
+        return None
+
+    def type_of(self, node: ast.AST) -> Optional[str]:
+        key = id(node)
+        if key not in self._types:
+            self._types[key] = self._infer(node)
+        return self._types[key]
+
+    def _infer(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return self.names.get(node.id)
+
+        if isinstance(node, ast.Attribute):
+            self.check_module_attr(node)
+            receiver = self.type_of(node.value)
+            if receiver is not None and node.attr not in self.table[receiver] \
+                    and node.attr not in self.plugins[receiver]:
+                self.report(node, "AttributeError", f"'{receiver}' object has no attribute '{node.attr}'"
+                            + _did_you_mean(node.attr, self.table[receiver]))
+            return None
+
+        if not isinstance(node, ast.Call):
+            return None
+
+        func = node.func
+        started = self.chain_class(func)
+        if started is not None:
+            self.check_arity(_constructor(started), node, f"{started}()", bound_self=False)
+            return started
+
+        if isinstance(func, ast.Attribute):
+            if self.module_of(func.value) == "exporters":
+                self.check_module_attr(func)
+                exported = getattr(cq_exporters, func.attr, None)
+                if inspect.isfunction(exported):
+                    self.check_arity(inspect.signature(exported), node, f"exporters.{func.attr}()", bound_self=False)
+                return None
+
+            receiver = self.type_of(func.value)
+            if receiver is None:
+                self.type_of(func)
+                return None
+            member = self.table[receiver].get(func.attr)
+            if member is None:
+                self.type_of(func)  # reports the unknown method
+                return None
+            if member.signature is not None:
+                self.check_arity(member.signature, node, f"{receiver}.{func.attr}()", bound_self=True)
+            return member.returns
+
+        self.type_of(func)
+        return None
+
+    # ----------------------------
+    # checks
+    # ----------------------------
+    def check_module_attr(self, node: ast.Attribute) -> None:
+        module = self.module_of(node.value)
+        if module is not None and node.attr not in _module_members()[module]:
+            qualified = "cadquery" if module == "cadquery" else "cadquery.exporters"
+            self.report(node, "AttributeError", f"module '{qualified}' has no attribute '{node.attr}'"
+                        + _did_you_mean(node.attr, _module_members()[module]))
+
+    def check_arity(self, signature: inspect.Signature, call: ast.Call, name: str, bound_self: bool) -> None:
+        error = _arity_error(signature, call, bound_self)
+        if error is not None:
+            self.report(call, "TypeError", f"{name}: {error}")
+
+    # ----------------------------
+    # statements, in program order
+    # ----------------------------
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.name == "cadquery":
+                self.modules[alias.asname or alias.name] = "cadquery"
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module == "cadquery":
+            for alias in node.names:
+                self.modules[alias.asname or alias.name] = \
+                    "exporters" if alias.name == "exporters" else f"cadquery.{alias.name}"
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.value)
+        value_type = self.type_of(node.value)
+        for target in node.targets:
+            self.bind(target, value_type)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if node.value is not None:
+            self.visit(node.value)
+        self.bind(node.target, self.type_of(node.value) if node.value is not None else None)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self.visit(node.value)
+        self.bind(node.target, None)
+
+    def visit_For(self, node: ast.For) -> None:
+        self.visit(node.iter)
+        self.bind(node.target, None)
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    def visit_With(self, node: ast.With) -> None:
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self.bind(item.optional_vars, None)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        for expr in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(expr)
+        outer = dict(self.names)
+        params = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        for arg in params + [a for a in (node.args.vararg, node.args.kwarg) if a is not None]:
+            self.names.pop(arg.arg, None)  # parameters are of unknown type
+        for stmt in node.body:
+            self.visit(stmt)
+        self.names = outer
+        self.names.pop(node.name, None)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        for expr in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(expr)
+        outer = dict(self.names)
+        params = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        for arg in params + [a for a in (node.args.vararg, node.args.kwarg) if a is not None]:
+            self.names.pop(arg.arg, None)
+        self.visit(node.body)
+        self.names = outer
+
+    def visit_ListComp(self, node: ast.AST) -> None:
+        # the first iterable is visited before any target is bound (it is evaluated in the enclosing scope); the
+        # targets are local to the comprehension
+        outer = dict(self.names)
+        for generator in node.generators:
+            self.visit(generator.iter)
+            self.bind(generator.target, None)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for expr in (node.key, node.value) if isinstance(node, ast.DictComp) else (node.elt,):
+            self.visit(expr)
+        self.names = outer
+
+    visit_SetComp = visit_GeneratorExp = visit_DictComp = visit_ListComp
+
+    def visit_Call(self, node: ast.Call) -> None:
+        self.type_of(node)
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if not isinstance(node.ctx, ast.Store):
+            self.type_of(node)
+        self.generic_visit(node)
+
+    def bind(self, target: ast.AST, value_type: Optional[str]) -> None:
+        if isinstance(target, ast.Name):
+            self.names[target.id] = value_type
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind(element, None)
+        elif isinstance(target, ast.Attribute):
+            self.visit(target.value)
+        else:
+            self.visit(target)
+
+
+def lint_program(prog: str) -> List[LintIssue]:
+    """Issues in program order. The program must parse (syntax errors are reported separately)."""
+    tree = ast.parse(prog)
+    linter = _Linter()
+    # plugin registrations (`cq.Workplane.my_method = my_method`), wherever they are in the program
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                registered = linter.chain_class(target.value) if isinstance(target, ast.Attribute) else None
+                if registered is not None:
+                    linter.plugins[registered].add(target.attr)
+    linter.visit(tree)
+    return sorted(linter.issues.values(), key=lambda issue: issue.line_no)
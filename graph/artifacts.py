@@ -0,0 +1,252 @@
+"""
+In-memory artifacts of a validated CadQuery model.
+
+Generated programs still call `cq.exporters.export(model, "object.stl")` etc., but during validation those calls are
+captured instead of writing files (see `graph.execution`). The exported shape is tessellated once, in the process that
+ran the program, into NumPy vertex/face buffers, and the STEP shape is kept as a binary B-Rep (a fast, lossless dump,
+unlike the STEP translation). Rendering and critique work on the buffers directly; files are written once, by the
+final export, for the design that passed the critique. The STL is written right away, the B-Rep based formats (STEP)
+on a background thread.
+"""
+
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+STL_RELATIVE_TOLERANCE = float(os.getenv("STL_RELATIVE_TOLERANCE", "0.001"))  # linear deflection / bbox diagonal
+STL_MIN_TOLERANCE = 0.001  # mm
+STL_ANGULAR_TOLERANCE = float(os.getenv("STL_ANGULAR_TOLERANCE", "0.2"))  # rad
+STL_TRIANGLE_BUDGET = int(os.getenv("STL_TRIANGLE_BUDGET", "200000"))
+MESH_PARALLEL = os.getenv("MESH_PARALLEL", "1") == "1"  # OCC meshes faces on all cores
+MAX_MESH_PASSES = 3
+
+EXPORT_FORMATS = [f.strip() for f in os.getenv("EXPORT_FORMATS", "stl,step").split(",") if f.strip()]
+EXPORT_IN_BACKGROUND = os.getenv("EXPORT_IN_BACKGROUND", "1") == "1"
+BREP_FORMATS = {"step": "object.step", "brep": "object.brep"}  # written from the B-Rep, not the mesh
+
+
+class ModelArtifacts(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vertices: np.ndarray  # (n, 3) float32
+    faces: np.ndarray  # (m, 3) int32
+    brep: Optional[bytes] = None  # binary B-Rep of the shape to export as STEP
+
+    # how the mesh was made
+    tolerance: Optional[float] = None  # linear deflection, mm
+    angular_tolerance: Optional[float] = None  # rad
+    mesh_s: Optional[float] = None
+
+    @property
+    def n_triangles(self) -> int:
+        return len(self.faces)
+
+
+def to_shape(obj: Any):
+    """Shape to export for a `Workplane` / `Shape` / iterable of shapes, the way `cq.exporters.export` resolves it."""
+    import cadquery as cq
+
+    if isinstance(obj, cq.Shape):
+        return obj
+    shapes = [o for o in obj if isinstance(o, cq.Shape)]
+    return shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+
+
+def _diagonal(shape) -> float:
+    # the fast (non-optimal) box is plenty to pick a deflection
+    from OCP.Bnd import Bnd_Box
+    from OCP.BRepBndLib import BRepBndLib
+
+    box = Bnd_Box()
+    BRepBndLib.Add_s(shape.wrapped, box)
+    return 0.0 if box.IsVoid() else box.SquareExtent() ** 0.5
+
+
+def mesh_tolerances(diagonal: float) -> Tuple[float, float]:
+    """Linear / angular deflection for a part: proportional to its size, so small and large parts mesh alike."""
+    return max(STL_MIN_TOLERANCE, STL_RELATIVE_TOLERANCE * diagonal), STL_ANGULAR_TOLERANCE
+
+
+def _mesh(shape, tolerance: float, angular_tolerance: float) -> int:
+    """(Re)triangulate every face. Returns the triangle count."""
+    from OCP.BRep import BRep_Tool
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    from OCP.BRepTools import BRepTools
+    from OCP.IMeshTools import IMeshTools_Parameters
+    from OCP.TopLoc import TopLoc_Location
+
+    BRepTools.Clean_s(shape.wrapped)  # drop triangulations of an earlier (finer) pass
+    params = IMeshTools_Parameters()
+    params.Deflection = tolerance
+    params.Angle = angular_tolerance
+    params.Relative = False
+    params.InParallel = MESH_PARALLEL
+    BRepMesh_IncrementalMesh(shape.wrapped, params)
+
+    return sum(poly.NbTriangles() for poly in
+               (BRep_Tool.Triangulation_s(face.wrapped, TopLoc_Location()) for face in shape.Faces())
+               if poly is not None)
+
+
+def _triangulation_buffers(shape) -> Tuple[np.ndarray, np.ndarray]:
+    """The faces' triangulations as one vertex / face buffer (outward winding)."""
+    from OCP.BRep import BRep_Tool
+    from OCP.TopAbs import TopAbs_REVERSED
+    from OCP.TopLoc import TopLoc_Location
+
+    vertices, faces, offset = [], [], 0
+    for face in shape.Faces():
+        location = TopLoc_Location()
+        poly = BRep_Tool.Triangulation_s(face.wrapped, location)
+        if poly is None:
+            continue
+        nodes = np.array([poly.Node(i).Coord() for i in range(1, poly.NbNodes() + 1)], dtype=np.float64)
+        trsf = location.Transformation()
+        matrix = np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+        vertices.append(nodes @ matrix[:, :3].T + matrix[:, 3])
+
+        triangles = np.array([poly.Triangle(i).Get() for i in range(1, poly.NbTriangles() + 1)], dtype=np.int32)
+        if face.wrapped.Orientation() == TopAbs_REVERSED:
+            triangles = triangles[:, [0, 2, 1]]
+        faces.append(triangles - 1 + offset)
+        offset += len(nodes)
+
+    if not faces:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32)
+    return np.concatenate(vertices).astype(np.float32), np.concatenate(faces)
+
+
+def tessellate(shape, tolerance: Optional[float] = None, angular_tolerance: Optional[float] = None,
+               diagonal: Optional[float] = None,
+               budget: int = STL_TRIANGLE_BUDGET) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
+    """
+    Mesh `shape` with OCC's incremental mesher, by default with deflections chosen from its bounding box. A mesh over
+    the triangle budget is redone with proportionally coarser deflection (triangle count ~ 1 / deflection).
+    Returns (vertices, faces, {tolerance, angular_tolerance, mesh_s}).
+    """
+    start = time.perf_counter()
+    default_tolerance, default_angular = mesh_tolerances(diagonal if diagonal is not None else _diagonal(shape))
+    tolerance = tolerance or default_tolerance
+    angular_tolerance = angular_tolerance or default_angular
+
+    n_triangles = _mesh(shape, tolerance, angular_tolerance)
+    for _ in range(MAX_MESH_PASSES - 1):
+        if n_triangles <= budget:
+            break
+        coarsen = n_triangles / budget
+        tolerance, angular_tolerance = tolerance * coarsen, min(angular_tolerance * coarsen ** 0.5, 0.5)
+        n_triangles = _mesh(shape, tolerance, angular_tolerance)
+
+    vertices, faces = _triangulation_buffers(shape)
+    return vertices, faces, {"tolerance": tolerance, "angular_tolerance": angular_tolerance,
+                             "mesh_s": time.perf_counter() - start}
+
+
+def brep_bytes(shape) -> bytes:
+    from OCP.BinTools import BinTools, BinTools_FormatVersion_CURRENT
+
+    stream = io.BytesIO()
+    BinTools.Write_s(shape.wrapped, stream, False, False, BinTools_FormatVersion_CURRENT)  # without the mesh
+    return stream.getvalue()
+
+
+def shape_from_brep(data: bytes):
+    import cadquery as cq
+
+    return cq.Shape.importBin(io.BytesIO(data))
+
+
+def build_artifacts(model: Any, exports: Dict[str, dict], diagonal: Optional[float] = None) -> ModelArtifacts:
+    """
+    Tessellate and serialize the shapes the program exported (`exports`: file name -> captured export call), falling
+    back to `model` for a file it didn't export through `cq.exporters`. Deflections the program passed explicitly
+    are kept; otherwise they are chosen from the part's size (`diagonal` of its bounding box, if already known).
+    """
+    stl = exports.get("object.stl") or {"shape": to_shape(model)}
+    vertices, faces, mesh_stats = tessellate(stl["shape"], stl.get("tolerance"), stl.get("angular_tolerance"),
+                                             diagonal)
+    step = exports.get("object.step") or {"shape": to_shape(model)}
+    return ModelArtifacts(vertices=vertices, faces=faces, brep=brep_bytes(step["shape"]), **mesh_stats)
+
+
+def stl_bytes(vertices: np.ndarray, faces: np.ndarray) -> bytes:
+    """Binary STL from vertex/face buffers."""
+    triangles = vertices[faces]  # (m, 3, 3)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+    record = np.dtype([("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+    data = np.zeros(len(faces), dtype=record)
+    data["normal"] = normals
+    data["vertices"] = triangles
+    header = b"cadquery model".ljust(80, b"\0")
+    return header + np.uint32(len(faces)).tobytes() + data.tobytes()
+
+
+_export_executor: Optional[ThreadPoolExecutor] = None
+_export_lock = threading.Lock()
+_pending_exports: List[Future] = []
+
+
+def _write_brep_formats(brep: bytes, paths: Dict[str, Path]) -> None:
+    start = time.perf_counter()
+    shape = shape_from_brep(brep)
+    for fmt, path in paths.items():
+        if fmt == "step":
+            shape.exportStep(str(path))
+        else:
+            shape.exportBrep(str(path))
+    print(f"Wrote {', '.join(p.name for p in paths.values())} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def write_artifacts(artifacts: ModelArtifacts, directory: str, formats: List[str] = EXPORT_FORMATS,
+                    background: bool = EXPORT_IN_BACKGROUND) -> Dict[str, str]:
+    """
+    Write the kept design's files. Returns extension -> path. With `background`, the B-Rep based formats are written
+    by a single export thread (the OCC STEP writer has global settings) and their paths are returned right away:
+    call `wait_for_exports` before reporting them as written (main.py does after every turn, and on exit).
+    """
+    unknown = set(formats) - {"stl"} - set(BREP_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown export formats {sorted(unknown)}. Expected: stl, {', '.join(BREP_FORMATS)}")
+
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+
+    written = {}
+    if "stl" in formats:
+        stl_path = out / "object.stl"
+        stl_path.write_bytes(stl_bytes(artifacts.vertices, artifacts.faces))
+        written["stl"] = str(stl_path)
+
+    brep_paths = {fmt: out / BREP_FORMATS[fmt] for fmt in formats if fmt in BREP_FORMATS}
+    if brep_paths and artifacts.brep is not None:
+        if background:
+            global _export_executor
+            with _export_lock:
+                if _export_executor is None:
+                    _export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cad-export")
+                _pending_exports[:] = [f for f in _pending_exports if not f.done()]
+                _pending_exports.append(_export_executor.submit(_write_brep_formats, artifacts.brep, brep_paths))
+        else:
+            _write_brep_formats(artifacts.brep, brep_paths)
+        written.update({fmt: str(path) for fmt, path in brep_paths.items()})
+    return written
+
+
+def wait_for_exports(timeout: Optional[float] = None) -> bool:
+    """Block until background exports are written. Returns False on timeout; re-raises a failed export."""
+    with _export_lock:
+        pending = list(_pending_exports)
+    done, not_done = wait(pending, timeout=timeout)
+    for future in done:
+        future.result()
+    return not not_done
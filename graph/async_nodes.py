@@ -0,0 +1,129 @@
+"""
+Async versions of the graph nodes, for `build_async_graph()` / `graph.ainvoke`.
+
+LLM calls are awaited natively (`ainvoke`), so many design sessions can share one event loop. CPU-bound stages
+(program exec, export, retrieval, screenshot rendering) are offloaded to `CPU_EXECUTOR` so they never block it.
+Prompt building and state updates are shared with the sync nodes in `graph.nodes`.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from graph.best_of_n import BEST_OF_N, arun_best_of_n
+from graph.compaction import compact_history, select_history
+from graph.critique_gate import get_gate_stats
+from graph.data_models import DesignInstructions
+from graph.llm import get_llm
+from graph.nodes import (
+    STREAM_CAD_GENERATION,
+    _check_dimensions,
+    _critique_messages,
+    _critique_update,
+    _gate_critique,
+    _gated_update,
+    _design_instructions_chain,
+    _design_instructions_update,
+    _dimensions_chain,
+    _dimensions_update,
+    _generation_prompt,
+    _render_views,
+    exporter,
+    extract_human_message,
+    retrieve_context,
+    validate_dimensions,
+    validate_program,
+)
+from graph.state import DesignCritiqueResult
+from graph.workspace import start_run
+from utils.code_stream import UnrecoverableProgramError, astream_program
+from utils.utils import strip_markdown_code_fences
+
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("CPU_WORKERS", os.cpu_count() or 4)),
+                                  thread_name_prefix="cad-cpu")
+
+
+async def _offload(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(CPU_EXECUTOR, func, *args)
+
+
+async def astart_run(state):
+    return start_run(state)
+
+
+async def aextract_human_message(state):
+    return extract_human_message(state)
+
+
+async def acompact_history(state):
+    return compact_history(state)
+
+
+async def aget_dimensions(state):
+    response = await _dimensions_chain().ainvoke({"messages": select_history(state["messages"], "get_dimensions")})
+    return _dimensions_update(response)
+
+
+async def avalidate_dimensions(state):
+    return validate_dimensions(state)
+
+
+async def aget_design_instructions(state):
+    history = select_history(state["messages"], "get_design_instructions")
+    design_obj: DesignInstructions = await _design_instructions_chain().ainvoke({"messages": history})
+    return _design_instructions_update(design_obj)
+
+
+async def aretrieve_context(state):
+    # Chroma lookups + knowledge base setup are blocking
+    return await _offload(retrieve_context, state)
+
+
+async def _acomplete_program(prompt, llm, variables) -> str:
+    if STREAM_CAD_GENERATION:
+        try:
+            return await astream_program(prompt | llm.bind(stream=True), variables)
+        except UnrecoverableProgramError as e:
+            print(f"Aborted streaming generation: {e}")
+            return e.program
+
+    response = await (prompt | llm).ainvoke(variables)
+    return strip_markdown_code_fences(response.content)
+
+
+async def agenerate_cad_program(state):
+    prompt, variables = _generation_prompt(state)
+
+    n_candidates = state.get("n_candidates") or BEST_OF_N
+    if n_candidates > 1:
+        return await arun_best_of_n(
+            lambda i: _acomplete_program(prompt, get_llm("cad_candidates").bind(seed=i), variables),
+            n=n_candidates,
+            check=lambda update: _check_dimensions(update, update.get("geometry"), state.get("dimensions")),
+        )
+
+    generated_prog = await _acomplete_program(prompt, get_llm("cad_generation"), variables)
+    return {"cadquery_program": generated_prog, "prevalidated_program": None}
+
+
+async def avalidate_program(state):
+    return await _offload(validate_program, state)
+
+
+async def aexporter(state):
+    return await _offload(exporter, state)
+
+
+async def adesign_critique(state):
+    gated = _gate_critique(state)
+    if gated is not None:
+        return _gated_update(gated, await _offload(_render_views, state) if gated.status else None)
+
+    views = await _offload(_render_views, state)
+
+    structured_llm = get_llm("design_critique").with_structured_output(DesignCritiqueResult, include_raw=True)
+    start = time.perf_counter()
+    output = await structured_llm.ainvoke(_critique_messages(state, views))
+    get_gate_stats().record_review(time.perf_counter() - start)
+    return _critique_update(output, views)
@@ -0,0 +1,205 @@
+"""
+Best-of-N program generation.
+
+Instead of the serial generate -> validate -> fix loop, N candidate programs are requested concurrently and each one
+is validated in the sandboxed execution pool (`graph.sandbox`) as soon as it arrives, then put through the same
+conformance checks as `validate_program` (`check`: the requested dimensions). With `first_valid` selection the first
+candidate that passes validation and those checks wins and the remaining generations/validations are cancelled;
+with `best` selection all candidates are validated and the best one by cheap geometric checks (single solid, valid
+BRep, fewest warnings) is kept. Per-candidate timings are recorded in `candidate_stats` so tokens can be traded for
+latency.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from graph.sandbox import get_execution_pool
+
+BEST_OF_N = int(os.getenv("BEST_OF_N", "1"))
+BEST_OF_N_SELECTION = os.getenv("BEST_OF_N_SELECTION", "first_valid")  # first_valid | best
+SELECTIONS = ("first_valid", "best")
+
+
+class _Race:
+    """Bookkeeping shared by the sync and async drivers."""
+
+    def __init__(self, n: int, selection: str, check: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown best-of-N selection `{selection}`. Expected one of {SELECTIONS}")
+        self.n = n
+        self.selection = selection
+        self.check = check
+        self.start = time.perf_counter()
+        self.stats: List[Dict[str, Any]] = [{"index": i, "status": "cancelled"} for i in range(n)]
+        self.finished: List[Dict[str, Any]] = []
+        self.winner: Optional[Dict[str, Any]] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def generated(self, index: int, generate_s: float) -> None:
+        self.stats[index].update(status="validating", generate_s=round(generate_s, 3))
+
+    def failed(self, index: int, stage: str, error: BaseException) -> None:
+        self.stats[index].update(status=f"{stage}_error", error=f"{type(error).__name__}: {error}")
+
+    def validated(self, index: int, program: str, outcome: Dict[str, Any]) -> bool:
+        """Record a validated candidate. Returns True once the race is decided."""
+        update = self.check(outcome["update"]) if self.check is not None else outcome["update"]
+        outcome = {**outcome, "update": update}
+        self.stats[index].update(
+            status="valid" if update["is_code_valid"] else "invalid",
+            validate_s=round(outcome["validate_s"], 3),
+            done_at_s=round(self.elapsed(), 3),
+            geometry=outcome["geometry"],
+        )
+        candidate = {"index": index, "program": program, **outcome}
+        self.finished.append(candidate)
+
+        if update["is_code_valid"] and self.selection == "first_valid":
+            self.winner = candidate
+        return self.winner is not None
+
+    def result(self) -> Dict[str, Any]:
+        if not self.finished:
+            errors = "; ".join(s.get("error", s["status"]) for s in self.stats)
+            raise RuntimeError(f"All {self.n} candidate programs failed before validation: {errors}")
+
+        winner = self.winner
+        if winner is None:
+            valid = [c for c in self.finished if c["update"]["is_code_valid"]]
+            if valid:
+                winner = min(valid, key=_geometric_rank)
+            else:
+                # nothing valid: repair the candidate whose error came latest in the program
+                winner = max(self.finished, key=lambda c: c["update"]["code_insights"].line_no or 0)
+
+        self.stats[winner["index"]]["selected"] = True
+
+        print(f"Best-of-{self.n}: candidate {winner['index']} selected after {self.elapsed():.2f}s "
+              f"({sum(s['status'] == 'valid' for s in self.stats)} valid)")
+
+        return {
+            "cadquery_program": winner["program"],
+            "prevalidated_program": winner["program"],
+            "is_code_valid": winner["update"]["is_code_valid"],
+            "code_insights": winner["update"]["code_insights"],
+            "artifacts": winner["update"].get("artifacts"),
+            "geometry": winner["update"].get("geometry"),
+            "n_candidates": self.n,
+            "candidate_stats": self.stats,
+        }
+
+
+def _geometric_rank(candidate: Dict[str, Any]):
+    geometry = candidate["geometry"] or {}
+    return (
+        geometry.get("solids") != 1,
+        not geometry.get("is_valid", False),
+        len(candidate["update"]["code_insights"].warning_msgs),
+        candidate["validate_s"],
+    )
+
+
+def _timed(generate: Callable[[int], str], index: int):
+    start = time.perf_counter()
+    return generate(index), time.perf_counter() - start
+
+
+def run_best_of_n(generate: Callable[[int], str], n: int = BEST_OF_N, selection: str = BEST_OF_N_SELECTION,
+                  check: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    `generate(i)` returns the i-th candidate program (blocking). Generations run on threads, validations on the
+    execution pool; `check` maps a validated candidate's state update to the update `validate_program` would return
+    (rejecting it on its dimensions). Returns the state update for the selected candidate.
+    """
+    race = _Race(n, selection, check)
+    pool = get_execution_pool(min_workers=n)
+    llm_threads = ThreadPoolExecutor(max_workers=n, thread_name_prefix="cad-candidate")
+
+    # copy the context so callbacks of the calling node (tracing) also see the candidate LLM calls
+    generations = {llm_threads.submit(contextvars.copy_context().run, _timed, generate, i): i for i in range(n)}
+    validations = {}
+    pending = set(generations)
+
+    try:
+        while pending and race.winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in generations:
+                    index = generations[future]
+                    try:
+                        program, generate_s = future.result()
+                    except Exception as e:
+                        race.failed(index, "generate", e)
+                        continue
+                    race.generated(index, generate_s)
+                    validation = pool.submit(program)
+                    validations[validation] = (index, program)
+                    pending.add(validation)
+                else:
+                    index, program = validations[future]
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        race.failed(index, "validate", e)
+                        continue
+                    if race.validated(index, program, outcome):
+                        break
+    finally:
+        # in-flight HTTP calls cannot be interrupted from another thread; their results are simply dropped
+        for future in pending:
+            future.cancel()
+        llm_threads.shutdown(wait=False, cancel_futures=True)
+
+    return race.result()
+
+
+async def arun_best_of_n(agenerate: Callable[[int], Awaitable[str]], n: int = BEST_OF_N,
+                         selection: str = BEST_OF_N_SELECTION,
+                         check: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Async variant of `run_best_of_n`: losing generations are cancelled outright."""
+    race = _Race(n, selection, check)
+    pool = get_execution_pool(min_workers=n)
+
+    async def timed(index: int):
+        start = time.perf_counter()
+        return await agenerate(index), time.perf_counter() - start
+
+    generations = {asyncio.ensure_future(timed(i)): i for i in range(n)}
+    validations = {}
+    pending = set(generations)
+
+    try:
+        while pending and race.winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task in generations:
+                    index = generations[task]
+                    try:
+                        program, generate_s = task.result()
+                    except Exception as e:
+                        race.failed(index, "generate", e)
+                        continue
+                    race.generated(index, generate_s)
+                    validation = asyncio.wrap_future(pool.submit(program))
+                    validations[validation] = (index, program)
+                    pending.add(validation)
+                else:
+                    index, program = validations[task]
+                    try:
+                        outcome = task.result()
+                    except Exception as e:
+                        race.failed(index, "validate", e)
+                        continue
+                    if race.validated(index, program, outcome):
+                        break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return race.result()
@@ -0,0 +1,96 @@
+"""
+Conversation history compaction.
+
+`CADState.messages` grows on every REPL turn (user requests, stringified dimension dicts, design JSON, validation
+notes) and every LLM node used to resend all of it. Two mechanisms keep prompt size flat across turns:
+
+- `compact_history` (graph node, start of each turn): once the history exceeds `HISTORY_COMPACT_TOKENS`, every AI
+  message is replaced by a single structured snapshot of the current design, and only the most recent user requests
+  are kept verbatim; older ones are folded into the snapshot as a rolling, truncated list.
+- `select_history` (inside nodes): trims what a node sends to its own token budget, newest messages first.
+"""
+
+import json
+from typing import Dict, List, Sequence
+
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+SNAPSHOT_ID = "design-snapshot"
+
+HISTORY_COMPACT_TOKENS = 3000  # compact once the full history is larger than this
+RECENT_REQUESTS_TOKENS = 600  # user requests kept verbatim (newest first) after compaction
+EARLIER_REQUEST_CHARS = 160  # older requests are truncated to this many chars in the snapshot
+MAX_EARLIER_REQUESTS = 10
+
+# per-node budget for the history a node sends to its LLM
+HISTORY_TOKEN_BUDGETS: Dict[str, int] = {
+    "get_dimensions": 2000,
+    "get_design_instructions": 3000,
+}
+
+
+def select_history(messages: Sequence[AnyMessage], node: str) -> List[AnyMessage]:
+    """Newest messages that fit the node's token budget; the design snapshot (if any) is always kept."""
+    return trim_messages(
+        messages,
+        max_tokens=HISTORY_TOKEN_BUDGETS[node],
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+        include_system=True,
+        allow_partial=False,
+    )
+
+
+def _previous_requests(snapshot: AnyMessage) -> List[str]:
+    return list(snapshot.additional_kwargs.get("earlier_requests", [])) if snapshot else []
+
+
+def _design_snapshot(state, earlier_requests: List[str]) -> SystemMessage:
+    lines = ["## CURRENT DESIGN SNAPSHOT (compacted conversation history)"]
+
+    if earlier_requests:
+        lines.append("### Earlier user requests (oldest first)")
+        lines.extend(f"- {r}" for r in earlier_requests)
+
+    if state.get("object_name"):
+        lines.append(f"### Object\n{state['object_name']}: {state.get('object_summary', '')}")
+
+    if state.get("dimensions"):
+        lines.append(f"### Current dimensions (JSON)\n{json.dumps(state['dimensions'], separators=(',', ':'))}")
+
+    if state.get("design_instructions"):
+        lines.append("### Current design instructions")
+        lines.extend(f"{i + 1}. {step}" for i, step in enumerate(state["design_instructions"]))
+
+    return SystemMessage(content="\n".join(lines), id=SNAPSHOT_ID,
+                         additional_kwargs={"earlier_requests": earlier_requests})
+
+
+def compact_history(state):
+    messages = state.get("messages", [])
+    if count_tokens_approximately(messages) <= HISTORY_COMPACT_TOKENS:
+        return {}
+
+    snapshot = next((m for m in messages if m.id == SNAPSHOT_ID), None)
+    requests = [m for m in messages if isinstance(m, HumanMessage)]
+
+    # newest requests verbatim while they fit, the latest one always
+    kept: List[HumanMessage] = []
+    for msg in reversed(requests):
+        if kept and count_tokens_approximately(kept + [msg]) > RECENT_REQUESTS_TOKENS:
+            break
+        kept.insert(0, msg)
+
+    folded = [
+        (m.content if len(m.content) <= EARLIER_REQUEST_CHARS else m.content[:EARLIER_REQUEST_CHARS] + "…")
+        for m in requests[:len(requests) - len(kept)]
+    ]
+    earlier = (_previous_requests(snapshot) + folded)[-MAX_EARLIER_REQUESTS:]
+
+    print(f"Compacted history: {len(messages)} messages -> {len(kept) + 1} "
+          f"({count_tokens_approximately(messages)} -> ~{count_tokens_approximately(kept)} tokens + snapshot)")
+
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), _design_snapshot(state, earlier), *kept]}
@@ -0,0 +1,258 @@
+"""
+Dimension conformance: the `dimensions` JSON of the request against the measured B-Rep (`GeometryReport`).
+
+`get_dimensions` turns the request into named numbers, but nothing compared the built model with them; mismatches
+were left to the LLM critic squinting at screenshots. Every numeric dimension is mapped to a measurement:
+- overall length / width / height / depth / thickness, diameter / radius: the bounding box extents, under the
+  assignment of names to axes that fits best (the request doesn't fix the orientation), only when they name all three
+  axes: an "overall" of two of them (a pair of gears' width and height) may well describe a view, not the box. A
+  thickness or depth is often a wall's or a plate's (an L-bracket's), not an extent: with one of them all the extents
+  are inferred
+- any other diameter, radius or bore: the nearest full cylinder, a hole when the name says so (hole, bore, inner,
+  axle, bolt), a boss when it says outer, shaft, boss or pin; with none within `DIMENSION_FAIL_DEVIATION` the feature
+  may simply not be a cylinder (a hex head, a fillet), so it is reported unmatched with the nearest one, not failed
+- a count or a bolt / pitch circle diameter naming a hole or boss feature (by its own name or its component's): the
+  number of full cylinders of that feature's matched diameter, or twice the mean distance of their axes from their
+  centre
+Everything else (fillets, teeth, depths of features) is reported as unmeasured. Deviations are relative; within
+`DIMENSION_TOLERANCE` a dimension conforms, beyond `DIMENSION_FAIL_DEVIATION` it fails. The report goes to the
+critique (its prompt and gate), whose rejection sends the numbers to the repair prompt. Failures of direct
+measurements (length / width / height, diameter of the bounding box) fail the gate; the inferred mappings only inform
+the LLM review. With `DIMENSION_REJECT=1` validation already rejects a program on its direct failures.
+"""
+
+import os
+import re
+from itertools import permutations
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from graph.geometry import CylinderFeature, GeometryReport
+
+DIMENSION_TOLERANCE = float(os.getenv("DIMENSION_TOLERANCE", "0.02"))  # relative deviation that conforms
+DIMENSION_FAIL_DEVIATION = float(os.getenv("DIMENSION_FAIL_DEVIATION", "0.10"))  # relative, fails
+DIMENSION_REJECT = os.getenv("DIMENSION_REJECT", "0") == "1"  # 1: validation rejects on direct failures
+DIMENSION_ABS_TOLERANCE = 0.05  # mm, for small dimensions
+
+# overall dimension names -> number of bounding box extents they span, and the scale to an extent
+EXTENT_DIMENSIONS = {"length": (1, 1.0), "width": (1, 1.0), "height": (1, 1.0), "depth": (1, 1.0),
+                     "thickness": (1, 1.0), "diameter": (2, 1.0), "outer_diameter": (2, 1.0), "radius": (2, 2.0)}
+AMBIGUOUS_EXTENTS = {"thickness", "depth"}  # often of a wall, plate or feature rather than of the whole box
+DIAMETER_WORDS = {"diameter", "dia", "bore", "radius"}
+CIRCLE_WORDS = {"circle", "pcd", "bcd"}
+COUNT_WORDS = {"count", "quantity", "number"}
+NOT_CYLINDER_WORDS = {"fillet", "chamfer", "corner", "edge"}
+HOLE_WORDS = {"hole", "holes", "bore", "inner", "axle", "bolt", "id"}
+BOSS_WORDS = {"outer", "shaft", "boss", "pin", "od"}
+
+
+class DimensionCheck(BaseModel):
+    name: str  # "<overall | component name>.<dimension>"
+    expected: float
+    measured: Optional[float] = None  # None: nothing measured maps to it
+    deviation: Optional[float] = None  # relative
+    source: str = ""  # what was measured
+    unit: str = "mm"
+    inferred: bool = False  # mapped to a measurement by its name (cylinders, ambiguous extents), not measured directly
+
+    def describe(self) -> str:
+        unit = f" {self.unit}" if self.unit else ""
+        if self.measured is None:
+            return f"{self.name}: expected {self.expected:g}{unit}, not measured" \
+                + (f" ({self.source})" if self.source else "")
+        return (f"{self.name}: expected {self.expected:g}{unit}, measured {self.measured:.4g}{unit} ({self.source}), "
+                f"{self.deviation:.1%} off")
+
+
+class ConformanceReport(BaseModel):
+    checks: List[DimensionCheck]
+    extents_checked: int  # bounding box axes an overall dimension maps to: 0 or 3
+    tolerance: float = DIMENSION_TOLERANCE
+    fail_deviation: float = DIMENSION_FAIL_DEVIATION
+
+    @property
+    def failures(self) -> List[DimensionCheck]:
+        return [c for c in self.checks if c.deviation is not None and c.deviation > self.fail_deviation]
+
+    @property
+    def hard_failures(self) -> List[DimensionCheck]:
+        """Failures of direct measurements: safe to reject a program on."""
+        return [c for c in self.failures if not c.inferred]
+
+    @property
+    def deviations(self) -> List[DimensionCheck]:
+        return [c for c in self.checks
+                if c.deviation is not None and self.tolerance < c.deviation <= self.fail_deviation]
+
+    @property
+    def conforming(self) -> List[DimensionCheck]:
+        return [c for c in self.checks if c.deviation is not None and c.deviation <= self.tolerance]
+
+    @property
+    def unmeasured(self) -> List[DimensionCheck]:
+        return [c for c in self.checks if c.measured is None]
+
+    def counts(self) -> str:
+        return (f"{len(self.conforming)} conform, {len(self.deviations)} off, {len(self.failures)} failed, "
+                f"{len(self.unmeasured)} not measured")
+
+    def summary(self) -> str:
+        if not self.checks:
+            return "no numeric dimensions to check"
+        lines = []
+        for check in self.checks:
+            verdict = "not measured" if check.measured is None else "FAIL" if check.deviation > self.fail_deviation \
+                else "ok" if check.deviation <= self.tolerance else "off"
+            lines.append(f"- [{verdict}] {check.describe()}")
+        return "\n".join(lines)
+
+
+def deviation(expected: float, measured: float) -> float:
+    """Relative deviation, with `DIMENSION_ABS_TOLERANCE` of slack for small dimensions."""
+    return max(0.0, abs(measured - expected) - DIMENSION_ABS_TOLERANCE) / expected
+
+
+def _words(*names: str) -> set:
+    return set(re.split(r"[\W_]+", " ".join(names).lower())) - {""}
+
+
+def dimension_groups(dimensions: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(group name, dimensions) of the overall dimensions and every component, in either layout of the JSON."""
+    body = (dimensions or {}).get("dimensions") or {}
+    groups = [("overall", body.get("overall") or {})]
+    for i, component in enumerate(body.get("components") or []):
+        if not isinstance(component, dict):
+            continue
+        values = component.get("dimensions")
+        if not isinstance(values, dict):
+            values = {key: value for key, value in component.items() if key != "name"}
+        groups.append((str(component.get("name") or f"component {i + 1}"), values))
+    return groups
+
+
+def _numeric(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def _extent_checks(overall: Dict[str, Any], size: Tuple[float, float, float]) -> Tuple[List[DimensionCheck], int]:
+    """
+    Checks of the overall extents (a diameter spans two axes: its worse one is reported), and the axes used: only
+    when they name exactly the three axes of the box, otherwise they are reported unmeasured.
+    """
+    expected, inferred = [], False
+    for name, value in overall.items():
+        key = str(name).lower().replace(" ", "_")
+        if key in EXTENT_DIMENSIONS and _numeric(value):
+            count, scale = EXTENT_DIMENSIONS[key]
+            expected += [(str(name), float(value) * scale)] * count
+            inferred |= key in AMBIGUOUS_EXTENTS
+    if not expected:
+        return [], 0
+    if len(expected) != len(size):
+        source = f"names {len(expected)} of the {len(size)} bounding box axes"
+        return [DimensionCheck(name=f"overall.{name}", expected=value, source=source)
+                for name, value in dict(expected).items()], 0
+
+    axes = min(permutations(size, len(expected)),
+               key=lambda axes: max(deviation(value, axis) for (_, value), axis in zip(expected, axes)))
+    checks: Dict[str, DimensionCheck] = {}
+    for (name, value), axis in zip(expected, axes):
+        check = DimensionCheck(name=f"overall.{name}", expected=value, measured=axis, deviation=deviation(value, axis),
+                               source="bounding box", inferred=inferred)
+        if name not in checks or check.deviation > checks[name].deviation:
+            checks[name] = check
+    return list(checks.values()), len(expected)
+
+
+def _same_cylinders(cylinders: List[CylinderFeature], match: CylinderFeature) -> List[CylinderFeature]:
+    return [c for c in cylinders if c.hole == match.hole and abs(c.diameter - match.diameter) <= 1e-3 * match.diameter]
+
+
+def _pattern_diameter(cylinders: List[CylinderFeature]) -> Optional[float]:
+    """Diameter of the circle through the cylinders' axes (around their centroid); None for fewer than 2."""
+    if len(cylinders) < 2:
+        return None
+    centre = [sum(c.axis_point[i] for c in cylinders) / len(cylinders) for i in range(3)]
+    radii = [sum((c.axis_point[i] - centre[i]) ** 2 for i in range(3)) ** 0.5 for c in cylinders]
+    return 2 * sum(radii) / len(radii)
+
+
+def _features(words: set) -> set:
+    return words & (HOLE_WORDS | BOSS_WORDS)
+
+
+def _group_checks(group: str, values: Dict[str, Any], cylinders: List[CylinderFeature], skip: set,
+                  fail_deviation: float) -> List[DimensionCheck]:
+    """Checks of one group's diameters against the full cylinders, then of its counts and bolt circles."""
+    # a component named after its feature ("bolt holes") lends that feature to all of its keys, "overall" doesn't
+    group_words = _words(group) if group != "overall" else set()
+    checks, matches = [], []  # matches: (feature words of the diameter, matched cylinder)
+    for key, value in values.items():
+        words = _words(str(key))
+        if key in skip or not _numeric(value) or words & (COUNT_WORDS | CIRCLE_WORDS):
+            continue
+        name = f"{group}.{key}"
+        if not words & DIAMETER_WORDS or words & NOT_CYLINDER_WORDS:
+            checks.append(DimensionCheck(name=name, expected=value))
+            continue
+
+        expected = float(value) * (2 if "radius" in words else 1)
+        hint = _words(group, str(key))
+        kinds = {True} if hint & HOLE_WORDS and not hint & BOSS_WORDS \
+            else {False} if hint & BOSS_WORDS and not hint & HOLE_WORDS else {True, False}
+        candidates = [c for c in cylinders if c.hole in kinds] or cylinders
+        if not candidates:
+            checks.append(DimensionCheck(name=name, expected=expected, source="no full cylinders"))
+            continue
+        match = min(candidates, key=lambda c: deviation(expected, c.diameter))
+        kind = "hole" if match.hole else "boss"
+        if deviation(expected, match.diameter) > fail_deviation:
+            checks.append(DimensionCheck(name=name, expected=expected,
+                                         source=f"no full cylinder near it; nearest: {match.diameter:g} mm {kind}"))
+            continue
+        checks.append(DimensionCheck(name=name, expected=expected, measured=match.diameter, inferred=True,
+                                     deviation=deviation(expected, match.diameter), source=f"{kind} diameter"))
+        matches.append((_features(words | group_words), match))
+
+    for key, value in values.items():
+        words = _words(str(key))
+        if key in skip or not _numeric(value) or not words & (COUNT_WORDS | CIRCLE_WORDS):
+            continue
+        name, unit = f"{group}.{key}", "" if words & COUNT_WORDS else "mm"
+        # only a count / circle that names a feature, of a diameter of the same feature ("number_of_teeth" isn't one)
+        feature = _features(words | group_words)
+        match = next((m for features, m in matches if feature & features), None)
+        if match is None:
+            source = "names no hole / boss feature" if not feature else "no matched diameter of the same feature"
+            checks.append(DimensionCheck(name=name, expected=value, unit=unit, source=source))
+            continue
+
+        same = _same_cylinders(cylinders, match)
+        kind = f"{match.diameter:g} mm {'holes' if match.hole else 'bosses'}"
+        if words & COUNT_WORDS:
+            checks.append(DimensionCheck(name=name, expected=value, measured=len(same), unit=unit, inferred=True,
+                                         deviation=abs(len(same) - value) / value, source=f"count of {kind}"))
+        else:
+            measured = _pattern_diameter(same)
+            checks.append(DimensionCheck(name=name, expected=value, measured=measured, inferred=True,
+                                         deviation=deviation(value, measured) if measured is not None else None,
+                                         source=f"circle through the {kind} axes" if measured is not None
+                                         else f"fewer than 2 {kind}"))
+    return checks
+
+
+def check_conformance(geometry: GeometryReport, dimensions: Dict[str, Any],
+                      tolerance: float = DIMENSION_TOLERANCE,
+                      fail_deviation: float = DIMENSION_FAIL_DEVIATION) -> ConformanceReport:
+    """Map every numeric dimension of the request to a measurement of `geometry` (see the module doc)."""
+    checks, extents_checked = [], 0
+    for group, values in dimension_groups(dimensions):
+        skip = set()
+        if group == "overall":
+            extent_checks, extents_checked = _extent_checks(values, geometry.size)
+            checks += extent_checks
+            skip = {key for key in values if str(key).lower().replace(" ", "_") in EXTENT_DIMENSIONS}
+        checks += _group_checks(group, values, geometry.cylinders, skip, fail_deviation)
+    return ConformanceReport(checks=checks, extents_checked=extents_checked, tolerance=tolerance,
+                             fail_deviation=fail_deviation)
@@ -0,0 +1,138 @@
+"""
+Deterministic gate in front of the multimodal design critique.
+
+The critique renders the model and sends the views to a vision LLM, the slowest step of every repair loop, even when
+the measurements alone already decide the outcome. The gate judges the `GeometryReport` against the `dimensions`
+JSON first, in microseconds:
+- critical geometry issues (solid count, B-Rep validity, open shells), if any reached the critique; geometry warnings
+  (thin walls, an estimate) go to the review
+- volume sanity: a tiny fill ratio of the bounding box is suspicious
+- the dimension conformance report (`graph.conformance`): overall extents fail fast; hole / boss diameters, counts and
+  bolt circles are mapped by name, so their failures go to the review
+
+Its verdict:
+- "fail": a measurement is clearly wrong; the critique returns the gate's `CritiqueIssue`s without calling the LLM
+- "pass": every dimension is measured and conforms, they specify the whole bounding box and nothing is suspicious;
+  the LLM review is skipped (`CRITIQUE_GATE_SKIP_REVIEW=0` keeps it, since it also judges intent: a sphere fits a
+  cube's box)
+- "review": anything else goes to the LLM as before
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from graph.conformance import check_conformance
+from graph.geometry import GeometryReport
+from graph.state import CritiqueIssue
+
+CRITIQUE_GATE = os.getenv("CRITIQUE_GATE", "1") == "1"  # 0: always go straight to the LLM review
+CRITIQUE_GATE_SKIP_REVIEW = os.getenv("CRITIQUE_GATE_SKIP_REVIEW", "1") == "1"  # 0: review the passes as well
+MIN_FILL_RATIO = 0.01  # volume / bounding box volume below which the solid is suspicious (review)
+
+
+class GateDecision(BaseModel):
+    verdict: str  # fail | pass | review
+    issues: List[CritiqueIssue]
+    notes: List[str]  # why the gate isn't confident (review), or what it verified (pass)
+    check_s: float
+
+    def summary(self) -> str:
+        lines = [f"- [{issue.severity}] {issue.description}" for issue in self.issues] \
+            + [f"- {note}" for note in self.notes]
+        return "\n".join(lines)
+
+
+def run_gate(geometry: Optional[GeometryReport], dimensions: Dict[str, Any]) -> GateDecision:
+    """Judge the measured geometry against the requested dimensions: fail, pass or review (see the module doc)."""
+    start = time.perf_counter()
+    issues, notes = [], []
+    if geometry is None:
+        return GateDecision(verdict="review", issues=[], notes=["no geometry measurements"],
+                            check_s=time.perf_counter() - start)
+
+    for issue in geometry.issues:
+        issues.append(CritiqueIssue(
+            category="geometry", severity="critical", description=issue,
+            suggestion="Build the model as one valid, closed solid with walls of real thickness."))
+
+    x, y, z = geometry.size
+    fill = geometry.volume / (x * y * z) if x * y * z > 0 else 0.0
+    if fill < MIN_FILL_RATIO:
+        notes.append(f"the solid fills {fill:.2%} of its bounding box")
+
+    notes += geometry.warnings
+    if geometry.min_thickness is None:
+        notes.append("the wall thickness could not be measured")
+
+    # inferred mappings (cylinders matched by name) may be wrong: their failures are for the LLM review to judge
+    report = check_conformance(geometry, dimensions)
+    for check in report.hard_failures:
+        issues.append(CritiqueIssue(category="dimensions", severity="critical", description=check.describe(),
+                                    suggestion=f"Make {check.name} {check.expected:g} {check.unit}".rstrip() + "."))
+    notes += [check.describe() for check in report.failures if check.inferred]
+    notes += [check.describe() for check in report.deviations + report.unmeasured]
+    if report.extents_checked < 3:
+        notes.append(f"only {report.extents_checked} of 3 bounding box extents are specified")
+
+    if issues:
+        verdict = "fail"
+    elif notes:
+        verdict = "review"
+    else:
+        verdict = "pass"
+        notes = [check.describe() for check in report.conforming]
+    return GateDecision(verdict=verdict, issues=issues, notes=notes, check_s=time.perf_counter() - start)
+
+
+class GateStats:
+    """Gate verdicts, and the LLM review time they saved (estimated from the average review actually run)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.verdicts = {"fail": 0, "pass": 0, "review": 0}
+        self.skipped = 0
+        self.reviews, self.review_s = 0, 0.0
+        self.saved_s = 0.0
+
+    def record_review(self, seconds: float) -> None:
+        with self._lock:
+            self.reviews += 1
+            self.review_s += seconds
+
+    def record_decision(self, decision: GateDecision, skipped: bool) -> Optional[float]:
+        """Count the verdict; returns the estimated seconds saved (None: no review timed yet, or not skipped)."""
+        with self._lock:
+            self.verdicts[decision.verdict] += 1
+            if not skipped:
+                return None
+            self.skipped += 1
+            if not self.reviews:
+                return None
+            saved = self.review_s / self.reviews
+            self.saved_s += saved
+            return saved
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.verdicts,
+                "skipped_reviews": self.skipped,
+                "avg_review_s": round(self.review_s / self.reviews, 3) if self.reviews else 0.0,
+                "saved_s": round(self.saved_s, 3),
+            }
+
+
+_stats: Optional[GateStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_gate_stats() -> GateStats:
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = GateStats()
+        return _stats
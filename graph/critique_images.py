@@ -0,0 +1,102 @@
+"""
+Rendered views as image content parts of the critique prompt, encoded for the smallest payload.
+
+The critique used to paste the base64 PNG composite into its system prompt, where the model can only read it as
+text: thousands of prompt tokens it cannot see as a picture. The views are now attached as image parts of a
+user message, at `CRITIQUE_IMAGE_DETAIL` fidelity. Vision models bill an image by its tiles, not its bytes: at "low"
+detail every image is a flat 85 tokens and is seen at up to 512 px, at "high" 170 tokens per 512 px tile are added and
+the image is seen at up to 768 px on its short side. Pixels beyond that are downscaled by the provider, so the views
+are rendered no larger (`max_image_side`).
+
+Bytes still cost upload time and request size, so the encoding stage picks:
+- the layout: one image per view (`views`), or the 2x2 `composite` in a single image (a quarter of the pixels per view)
+- grayscale (the renders are gray shading and black lines: lossless, and a third of the raw data)
+- the format: PNG, JPEG, WebP at `CRITIQUE_IMAGE_QUALITY`, lossless WebP, or `auto`: the smaller per image of lossy and
+  lossless WebP (lossless wins on flat faces and edge lines, lossy on dense faceted shading; lossless WebP is always
+  smaller than PNG, and JPEG smears the lines). See `benchmarks/bench_critique_images.py`.
+"""
+
+import base64
+import math
+import os
+import time
+from io import BytesIO
+from typing import Any, Dict, List
+
+from PIL import Image, features
+
+from utils.generate_screenshots import IMAGE_FORMATS, encode_image, tile_views
+
+CRITIQUE_IMAGE_SIZE = int(os.getenv("CRITIQUE_IMAGE_SIZE", "512"))  # px, per (square) view
+CRITIQUE_IMAGE_DETAIL = os.getenv("CRITIQUE_IMAGE_DETAIL", "low")  # low | high | auto
+CRITIQUE_IMAGE_LAYOUT = os.getenv("CRITIQUE_IMAGE_LAYOUT", "views")  # views | composite
+CRITIQUE_IMAGE_FORMAT = os.getenv("CRITIQUE_IMAGE_FORMAT", "auto")  # auto | png | jpeg | webp | webp-lossless
+CRITIQUE_IMAGE_QUALITY = int(os.getenv("CRITIQUE_IMAGE_QUALITY", "80"))  # of the lossy formats
+CRITIQUE_IMAGE_GRAYSCALE = os.getenv("CRITIQUE_IMAGE_GRAYSCALE", "1") == "1"
+
+AUTO_FORMATS = ("webp-lossless", "webp") if features.check("webp") else ("png",)
+
+# OpenAI vision pricing (gpt-4o family): base tokens per image, plus per 512 px tile at high detail
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+
+
+def image_tokens(width: int, height: int, detail: str = CRITIQUE_IMAGE_DETAIL) -> int:
+    """Prompt tokens an image costs at `detail` ("auto" is estimated as "high", its upper bound)."""
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    # fit in 2048 x 2048, then shrink until the short side is at most 768 px, and count 512 px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    scale *= min(1.0, 768 / (min(width, height) * scale))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def max_image_side(detail: str = CRITIQUE_IMAGE_DETAIL) -> int:
+    """Largest side of a square image the provider looks at, without downscaling it, at `detail`."""
+    return 512 if detail == "low" else 768
+
+
+def view_size(size: int = CRITIQUE_IMAGE_SIZE, layout: str = CRITIQUE_IMAGE_LAYOUT,
+              detail: str = CRITIQUE_IMAGE_DETAIL) -> int:
+    """Px per view to render: `size`, capped so that the sent image (a view, or the composite) isn't downscaled."""
+    return min(size, max_image_side(detail) // (2 if layout == "composite" else 1))
+
+
+def encode_views(views: Dict[str, Image.Image], layout: str = CRITIQUE_IMAGE_LAYOUT,
+                 fmt: str = CRITIQUE_IMAGE_FORMAT, quality: int = CRITIQUE_IMAGE_QUALITY,
+                 grayscale: bool = CRITIQUE_IMAGE_GRAYSCALE) -> Dict[str, bytes]:
+    """Image name -> encoded image: one per view, or the single composite; reports the payload and encode time."""
+    if fmt != "auto" and fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown CRITIQUE_IMAGE_FORMAT {fmt!r}: expected auto or one of {sorted(IMAGE_FORMATS)}")
+    start = time.perf_counter()
+    if layout == "composite":
+        views = {"2x2 " + " / ".join(views): tile_views(views)}
+    encoded = {}
+    for name, image in views.items():
+        image = image.convert("L") if grayscale else image
+        candidates = [encode_image(image, f, quality) for f in (AUTO_FORMATS if fmt == "auto" else (fmt,))]
+        encoded[name] = min(candidates, key=len)
+
+    formats = sorted({Image.open(BytesIO(data)).format for data in encoded.values()})
+    print(f"Encoded {len(encoded)} critique image(s) ({layout}, {'/'.join(formats)}, {fmt}"
+          f"{', gray' if grayscale else ''}): {sum(map(len, encoded.values())) / 1024:.1f} KB "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return encoded
+
+
+def image_parts(images: Dict[str, bytes], detail: str = CRITIQUE_IMAGE_DETAIL) -> List[Dict[str, Any]]:
+    """Message content parts for the images: each image's view name(s), then the image as a data URL."""
+    parts = []
+    for name, data in images.items():
+        mime = Image.MIME[Image.open(BytesIO(data)).format]
+        parts.append({"type": "text", "text": f"{name} view:"})
+        parts.append({"type": "image_url",
+                      "image_url": {"url": f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}",
+                                    "detail": detail}})
+    return parts
+
+
+def views_tokens(images: Dict[str, bytes], detail: str = CRITIQUE_IMAGE_DETAIL) -> int:
+    """Estimated prompt tokens of all the images."""
+    return sum(image_tokens(*Image.open(BytesIO(data)).size, detail=detail) for data in images.values())
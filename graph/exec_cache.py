@@ -0,0 +1,195 @@
+"""
+Cache of program execution outcomes, keyed on a normalized AST.
+
+Repair and critique loops often regenerate a program that was already run, differing only in whitespace, comments,
+docstrings or the order of the leading parameter assignments. Such programs normalize to the same AST, so the
+earlier outcome (`is_code_valid`, `CodeInsights`, the in-memory mesh / B-Rep artifacts) is returned without
+re-executing. Entries are evicted least-recently-used once `EXEC_CACHE_MAX_BYTES` is exceeded.
+"""
+
+import ast
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+EXEC_CACHE_MAX_BYTES = int(os.getenv("EXEC_CACHE_MAX_BYTES", str(256 * 2 ** 20)))  # 0 disables the cache
+ENTRY_OVERHEAD_BYTES = 2048  # insights, geometry summary, bookkeeping
+
+
+_PARAMETER_NODES = (ast.Constant, ast.Name, ast.Load, ast.BinOp, ast.UnaryOp, ast.operator, ast.unaryop, ast.Tuple,
+                    ast.List)
+
+
+def _is_parameter(stmt: ast.stmt) -> bool:
+    """`name = <expression of literals and names>`: no calls, so evaluating it has no side effects."""
+    return (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+            and all(isinstance(n, _PARAMETER_NODES) for n in ast.walk(stmt.value)))
+
+
+def _sort_parameter_blocks(body: List[ast.stmt]) -> List[ast.stmt]:
+    """
+    Sort runs of consecutive parameter assignments by name. A run ends before a statement that reads or reassigns a
+    name assigned earlier in it, or assigns a name read earlier in it (`y = x` then `x = 10`): no statement of a run
+    depends on another, so reordering it cannot change what the program does.
+    """
+    out: List[ast.stmt] = []
+    block: List[ast.Assign] = []
+
+    def flush():
+        out.extend(sorted(block, key=lambda s: s.targets[0].id))
+        block.clear()
+
+    for stmt in body:
+        if not _is_parameter(stmt):
+            flush()
+            out.append(stmt)
+            continue
+        assigned = {s.targets[0].id for s in block}
+        read = {n.id for s in block for n in ast.walk(s.value) if isinstance(n, ast.Name)}
+        reads = {n.id for n in ast.walk(stmt.value) if isinstance(n, ast.Name)}
+        if stmt.targets[0].id in assigned | read or reads & assigned:
+            flush()
+        block.append(stmt)
+    flush()
+    return out
+
+
+def program_key(prog: str) -> Optional[str]:
+    """Hash of the normalized AST, or None if the program doesn't parse (those fail fast anyway)."""
+    try:
+        tree = ast.parse(prog)
+    except (SyntaxError, ValueError):
+        return None
+
+    for node in ast.walk(tree):
+        body = getattr(node, "body", None)
+        if isinstance(body, list):
+            # docstrings / bare string statements have no effect
+            body = [s for s in body if not (isinstance(s, ast.Expr) and isinstance(s.value, ast.Constant)
+                                            and isinstance(s.value.value, str))] or [ast.Pass()]
+            node.body = _sort_parameter_blocks(body) if isinstance(node, ast.Module) else body
+
+    dump = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def _outcome_bytes(outcome: Dict[str, Any]) -> int:
+    artifacts = outcome["update"].get("artifacts")
+    size = ENTRY_OVERHEAD_BYTES
+    if artifacts is not None:
+        size += artifacts.vertices.nbytes + artifacts.faces.nbytes + len(artifacts.brep or b"")
+    return size
+
+
+def _error_line(prog: str, line_no: Optional[int]) -> Optional[str]:
+    lines = prog.splitlines()
+    return lines[line_no - 1].strip() if line_no and line_no <= len(lines) else None
+
+
+class ExecutionCache:
+    def __init__(self, max_bytes: int = EXEC_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self.saved_s = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, prog: str) -> Optional[Dict[str, Any]]:
+        key = program_key(prog) if self.enabled else None
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_s += entry["outcome"]["validate_s"]
+
+        return self._for_program(entry, prog)
+
+    def put(self, prog: str, outcome: Dict[str, Any]) -> None:
+        key = program_key(prog) if self.enabled else None
+        if key is None or outcome.get("infra_error"):  # timeouts / crashed workers may not repeat
+            return
+
+        insights = outcome["update"]["code_insights"]
+        entry = {"outcome": outcome, "error_line": _error_line(prog, insights.line_no),
+                 "bytes": _outcome_bytes(outcome)}
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous["bytes"]
+            self._entries[key] = entry
+            self._bytes += entry["bytes"]
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["bytes"]
+                self.evictions += 1
+
+    def run(self, prog: str, execute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        cached = self.get(prog)
+        if cached is not None:
+            return cached
+        outcome = execute()
+        self.put(prog, outcome)
+        return outcome
+
+    @staticmethod
+    def _for_program(entry: Dict[str, Any], prog: str) -> Dict[str, Any]:
+        """Copy of a cached outcome, with the error line number mapped onto this program's text."""
+        outcome = entry["outcome"]
+        update = dict(outcome["update"])
+        insights = update["code_insights"]
+
+        old_line, text = insights.line_no, entry["error_line"]
+        if old_line and text:
+            lines = [line.strip() for line in prog.splitlines()]
+            if text in lines and lines.index(text) + 1 != old_line:
+                new_line = lines.index(text) + 1
+                update["code_insights"] = insights.model_copy(update={
+                    "line_no": new_line,
+                    "error_stack": insights.error_stack.replace(f"at line {old_line}", f"at line {new_line}", 1),
+                })
+
+        print(f"Execution cache hit: skipped a {outcome['validate_s']:.2f}s run")
+        return {**outcome, "update": update, "cached": True}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_s": round(self.saved_s, 3),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache: Optional[ExecutionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_execution_cache() -> ExecutionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExecutionCache()
+        return _cache
@@ -0,0 +1,261 @@
+"""
+Execution of generated CadQuery programs.
+
+Kept free of LLM / vector-store imports so that worker processes which only run programs import just `cadquery`.
+"""
+
+import ast
+import os
+import sys
+import threading
+import warnings
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+import cadquery as cq
+import cadquery.cq as cq_workplane
+import cadquery.occ_impl.exporters as cq_exporters
+from graph.api_lint import lint_program
+from graph.artifacts import build_artifacts, to_shape
+from graph.geometry import check_geometry
+from graph.state import CodeInsights
+
+# the export hook is process-wide: in-process runs (threads) take turns
+_export_hook_lock = threading.Lock()
+
+
+@contextmanager
+def _captured_exports() -> Iterator[Dict[str, dict]]:
+    """
+    Record `cq.exporters.export` / `Workplane.export` calls (file name -> shape and tessellation tolerances, None
+    unless the program set them) instead of writing the files: the model is tessellated and serialized in memory
+    afterwards (see `graph.artifacts`). Nothing is written, so programs run in any working directory.
+    """
+    exports: Dict[str, dict] = {}
+
+    def export(w, fname, exportType=None, tolerance=None, angularTolerance=None, *args, **kwargs):
+        exports[os.path.basename(str(fname))] = {"shape": to_shape(w), "tolerance": tolerance,
+                                                 "angular_tolerance": angularTolerance}
+
+    with _export_hook_lock:
+        originals = cq_exporters.export, cq_workplane.export
+        cq_exporters.export = cq_workplane.export = export
+        try:
+            yield exports
+        finally:
+            cq_exporters.export, cq_workplane.export = originals
+
+
+def execute_program(prog: str) -> Tuple[dict, Any]:
+    """
+    Syntax-check and execute a generated CadQuery program, then check the `model` contract and the exports.
+    Returns (state update with `is_code_valid` / `code_insights`, the `geometry` checks once the model exists and,
+    on success, the in-memory `artifacts`; the built `model` or None on failure).
+    """
+
+    expected_files = ("object.stl", "object.step")
+    warning_msgs = []
+
+    # ----------------------------
+    # 1. Syntax pre-check
+    # ----------------------------
+    try:
+        ast.parse(prog)
+    except SyntaxError as e:
+        print(f"SyntaxError at line {e.lineno}: {e.msg}")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack=f"SyntaxError at line {e.lineno}: {e.msg}",
+                line_no=e.lineno,
+                warning_msgs=warning_msgs,
+            )}, None
+
+    # ----------------------------
+    # 1b. Static CadQuery API check: invented methods / wrong arguments fail here, before any kernel work
+    # ----------------------------
+    issues = lint_program(prog)
+    if issues:
+        lines = prog.splitlines()
+        error_stack = "\n\n".join(
+            f"{issue.kind} at line {issue.line_no}: `{lines[issue.line_no - 1].strip()}`\n"
+            f"Error message: {issue.message} (static CadQuery API check)"
+            for issue in issues)
+        print(error_stack)
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack=error_stack,
+                line_no=issues[0].line_no,
+                warning_msgs=warning_msgs,
+            )}, None
+
+    # ----------------------------
+    # 2. Soft CadQuery import check
+    # ----------------------------
+    try:
+        tree = ast.parse(prog)
+        has_cq_import = any(
+            isinstance(node, (ast.Import, ast.ImportFrom)) and
+            (
+                    any(
+                        getattr(alias, "name", "").startswith("cadquery")
+                        for alias in getattr(node, "names", [])
+                    ) or
+                    getattr(node, "module", "").startswith("cadquery")
+            )
+            for node in ast.walk(tree)
+        )
+        if not has_cq_import:
+            warning_msgs.append(
+                "CadQuery import not found. Expected: import cadquery as cq"
+            )
+    except Exception:  # type: ignore
+        # Defensive, ignore
+        pass
+
+    # ----------------------------
+    # 3. Execute code safely
+    # ----------------------------
+    exec_globals = {
+        "__builtins__": __builtins__,
+        "cq": cq,
+    }
+    exec_locals = {}
+
+    runtime_warnings = []
+    with warnings.catch_warnings(record=True) as w, _captured_exports() as exports:
+        warnings.simplefilter("always")
+        try:
+            exec(prog, exec_globals)
+            runtime_warnings.extend([str(warn.message) for warn in w])
+        except Exception:
+            exc_type, exc_value, exc_tb = sys.exc_info()
+            # Walk the traceback to the deepest frame inside the executed code (not cadquery / OCC internals)
+            tb, program_tb = exc_tb, None
+            while tb is not None:
+                if tb.tb_frame.f_code.co_filename == "<string>":
+                    program_tb = tb
+                tb = tb.tb_next
+            # Get the line number in the executed string
+            lineno = (program_tb or exc_tb).tb_lineno
+            # Extract the actual line from the string
+            line = prog.splitlines()[lineno - 1] if lineno <= len(prog.splitlines()) else "<line not found>"
+            print(f"{exc_type.__name__} at line {lineno}: `{line.strip()}`\nError message: {exc_value}")
+            return {
+                "is_code_valid": False,
+                "code_insights": CodeInsights(
+                    error_stack=f"{exc_type.__name__} at line {lineno}: `{line.strip()}`\nError message: {exc_value}",
+                    line_no=lineno,
+                    warning_msgs=warning_msgs + runtime_warnings,
+                )}, None
+
+    # ----------------------------
+    # 4. Validate `model` contract
+    # ----------------------------
+    model: Any = exec_locals.get("model") or exec_globals.get("model")
+    if model is None:
+        print("No `model` object was created. The final CAD object must be assigned to `model`.")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack="No `model` object was created. The final CAD object must be assigned to `model`.",
+                line_no=None,
+                warning_msgs=warning_msgs + runtime_warnings,
+            )}, None
+
+    # Safe .val() geometry check
+    if not hasattr(model, "val"):
+        print("`model` exists but does not have a `.val()` method (invalid geometry).")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack="`model` exists but does not have a `.val()` method (invalid geometry).",
+                line_no=None,
+                warning_msgs=warning_msgs + runtime_warnings,
+            )}, None
+
+    # Optional: trigger .val() to catch runtime CAD errors
+    try:
+        model.val()
+    except Exception as e:
+        print(f"Geometry error in `model.val()`: {str(e)}")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack=f"Geometry error in `model.val()`: {str(e)}",
+                line_no=None,
+                warning_msgs=warning_msgs + runtime_warnings,
+            )}, None
+
+    # ----------------------------
+    # 5. Validate exports (captured `cq.exporters.export` calls; files written any other way aren't looked for)
+    # ----------------------------
+    missing_files = [f for f in expected_files if f not in exports]
+    if missing_files:
+        print(f"Missing exported files: {missing_files}")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack=f"Missing exported files: {missing_files} (export them with `cq.exporters.export`)",
+                line_no=None,
+                warning_msgs=warning_msgs + runtime_warnings,
+            )
+        }, None
+
+    all_warnings = warning_msgs + runtime_warnings
+
+    # ----------------------------
+    # 6. Geometry integrity checks (before the costlier tessellation, rendering and critique)
+    # ----------------------------
+    try:
+        geometry = check_geometry(to_shape(model))
+    except Exception as e:
+        geometry = None
+        all_warnings = all_warnings + [f"Geometry checks could not run: {type(e).__name__}: {e}"]
+    else:
+        print(f"Geometry checks ({geometry.check_s * 1000:.0f} ms): {geometry.summary()}")
+        if not geometry.ok:
+            error_stack = "Geometry check failed:\n" + "\n".join(f"- {issue}" for issue in geometry.issues) \
+                          + f"\nMeasured: {geometry.summary()}"
+            print(error_stack)
+            return {
+                "is_code_valid": False,
+                "code_insights": CodeInsights(
+                    error_stack=error_stack,
+                    line_no=None,
+                    warning_msgs=all_warnings,
+                ),
+                "geometry": geometry,
+            }, None
+
+    # ----------------------------
+    # 7. Tessellate / serialize in memory
+    # ----------------------------
+    try:
+        artifacts = build_artifacts(model, exports, geometry.diagonal if geometry is not None else None)
+    except Exception as e:
+        print(f"Export error: {type(e).__name__}: {e}")
+        return {
+            "is_code_valid": False,
+            "code_insights": CodeInsights(
+                error_stack=f"Export error (tessellation / B-Rep serialization): {type(e).__name__}: {e}",
+                line_no=None,
+                warning_msgs=all_warnings,
+            )
+        }, None
+    print(f"Meshed {artifacts.n_triangles} triangles in {artifacts.mesh_s * 1000:.0f} ms "
+          f"(deflection {artifacts.tolerance:.3g} mm, {artifacts.angular_tolerance:.2f} rad)")
+
+    # Success
+    return {
+        "is_code_valid": True,
+        "code_insights": CodeInsights(
+            error_stack=None,
+            line_no=None,
+            warning_msgs=all_warnings,
+        ),
+        "artifacts": artifacts,
+        "geometry": geometry,
+    }, model
+
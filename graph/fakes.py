@@ -0,0 +1,208 @@
+"""
+Deterministic fake LLM provider, for benchmarking and load-testing the graph offline (no network, no cost).
+
+- `FakeChatModel`: scripted plain and structured replies with a seeded latency distribution. Streams line by line,
+  so the streaming generation path is exercised too, and reports approximate token usage.
+- `FakeEmbeddings`: hashed bag-of-words vectors, so the knowledge base can be built and queried offline.
+- `install_fake_provider(fixture)`: registers fakes for every LLM role and the knowledge-base embeddings from a
+  fixture JSON file (see `benchmarks/fixtures/`).
+
+Install a single role through the LLM registry:
+
+    register_llm("design_critique", FakeChatModel(structured={"DesignCritiqueResult": {...}}, latency=0.5))
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Literal, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, PrivateAttr
+
+from graph.llm import LLM_PROFILES, register_embeddings, register_llm
+
+
+class Latency(BaseModel):
+    """Seconds per call: `mean` with `jitter` spread (uniform: +/- jitter, normal: stddev, lognormal: sigma)."""
+    mean: float = 0.0
+    jitter: float = 0.0
+    distribution: Literal["fixed", "uniform", "normal", "lognormal"] = "fixed"
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "fixed" or self.jitter <= 0 or self.mean <= 0:
+            return self.mean
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean - self.jitter, self.mean + self.jitter))
+        if self.distribution == "normal":
+            return max(0.0, rng.gauss(self.mean, self.jitter))
+        # lognormal with the requested mean: heavy right tail, like real completion latencies
+        return rng.lognormvariate(math.log(self.mean) - self.jitter ** 2 / 2, self.jitter)
+
+
+class FakeChatModel(BaseChatModel):
+    # plain completions; a list is a script played in call order, its last entry repeating once exhausted
+    reply: Union[str, List[str]] = ""
+    # tool/schema name -> arguments (or a script of them), for `with_structured_output`
+    structured: Dict[str, Union[dict, List[dict]]] = {}
+    latency: Union[float, Latency] = 0.0  # seconds per call
+    seed: int = 0
+    model: str = "fake-chat"
+
+    _rng: random.Random = PrivateAttr()
+    _calls: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _next(self, key: str, script: Union[Any, List[Any]]) -> Any:
+        if not isinstance(script, list):
+            return script
+        with self._lock:
+            i = self._calls.get(key, 0)
+            self._calls[key] = i + 1
+        return script[min(i, len(script) - 1)]
+
+    def _delay(self) -> float:
+        if isinstance(self.latency, Latency):
+            with self._lock:
+                return self.latency.sample(self._rng)
+        return self.latency
+
+    def _message(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        tools = kwargs.get("tools")
+        if tools:
+            name = tools[0]["function"]["name"]
+            args = self._next(name, self.structured[name])
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_fake"}])
+            output_tokens = count_tokens_approximately([AIMessage(content=json.dumps(args))])
+        else:
+            message = AIMessage(content=self._next("reply", self.reply))
+            output_tokens = count_tokens_approximately([message])
+        input_tokens = count_tokens_approximately(messages)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        return message
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    def _chunks(self, message: AIMessage) -> List[ChatGenerationChunk]:
+        lines = message.content.splitlines(keepends=True) or [""]
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=line)) for line in lines]
+        chunks[-1].message.usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay())  # time to first token; the rest arrives at once
+        for chunk in self._chunks(self._message(messages, **kwargs)):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay())
+        for chunk in self._chunks(self._message(messages, **kwargs)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embeddings: deterministic, and texts sharing words land close together, so similarity search
+    over the knowledge base still returns plausible neighbours.
+    """
+
+    def __init__(self, size: int = 256, latency: Union[float, Latency] = 0.0, seed: int = 0):
+        self.size = size
+        self.latency = latency
+        self.model = f"fake-hash-{size}"
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> None:
+        if isinstance(self.latency, Latency):
+            with self._lock:
+                delay = self.latency.sample(self._rng)
+        else:
+            delay = self.latency
+        time.sleep(delay)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in re.findall(r"[a-z_][a-z0-9_]*", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._delay()  # one batched request
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._delay()
+        return self._embed(text)
+
+
+def load_fixture(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Fixture JSON with the scripted replies of one design session:
+    `dimensions` (dict or list), `design_instructions` (`DesignInstructions` args or list), `programs` (list of
+    CadQuery programs, played in order) and `critiques` (`DesignCritiqueResult` args or list).
+    """
+    with open(path, encoding="utf-8") as fp:
+        fixture = json.load(fp)
+    missing = {"dimensions", "design_instructions", "programs", "critiques"} - set(fixture)
+    if missing:
+        raise ValueError(f"Fixture {path} is missing {sorted(missing)}")
+    return fixture
+
+
+def install_fake_provider(fixture: Dict[str, Any], latency: Union[float, Latency] = 0.0,
+                          embedding_latency: Union[float, Latency] = 0.0, seed: int = 0) -> None:
+    """Register fakes for every LLM role and for the knowledge-base embeddings."""
+    dimensions = fixture["dimensions"]
+    replies = {
+        "dimensions": [json.dumps(d) for d in dimensions] if isinstance(dimensions, list) else json.dumps(dimensions),
+        "cad_generation": fixture["programs"],
+        "cad_candidates": fixture["programs"],
+    }
+    structured = {
+        "design_instructions": {"DesignInstructions": fixture["design_instructions"]},
+        "design_critique": {"DesignCritiqueResult": fixture["critiques"]},
+    }
+    for i, role in enumerate(LLM_PROFILES):
+        register_llm(role, FakeChatModel(reply=replies.get(role, ""), structured=structured.get(role, {}),
+                                         latency=latency, seed=seed + i))
+    register_embeddings(FakeEmbeddings(latency=embedding_latency, seed=seed))
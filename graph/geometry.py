@@ -0,0 +1,250 @@
+"""
+Deterministic geometry checks of a validated model, straight on the B-Rep.
+
+What the critique prompt asks the LLM to judge from a screenshot (a single solid body, no self-intersections, no
+zero-thickness walls) is measured here, typically in milliseconds: solid / shell counts, `isValid`, volume, closed
+shells, bounding box and a ray-cast estimate of the minimum wall thickness. Critical failures reject the program before
+the views are rendered, with the numbers in the repair prompt. The wall thickness is only an estimate, so a thin wall
+is a warning for the critique (its prompt and gate), never a rejection. Full cylinders (holes, bores, bosses, shafts)
+are listed with their axes, for the dimension conformance checks (see `graph.conformance`).
+"""
+
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Any, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+GEOMETRY_MIN_THICKNESS = float(os.getenv("GEOMETRY_MIN_THICKNESS", "0.2"))  # mm
+GEOMETRY_MIN_THICKNESS_RATIO = 0.01  # of the bounding box diagonal, so small-scale models aren't rejected
+GEOMETRY_THICKNESS_SAMPLES = int(os.getenv("GEOMETRY_THICKNESS_SAMPLES", "256"))
+GEOMETRY_SINGLE_SOLID = os.getenv("GEOMETRY_SINGLE_SOLID", "1") == "1"  # 0: allow multi-body models
+SAMPLE_FRACTIONS = (0.25, 0.5, 0.75)  # of each face's UV range: 3x3 points per face
+
+
+class CylinderFeature(BaseModel):
+    diameter: float
+    hole: bool  # material around the cylinder (hole / bore), or inside it (boss / shaft)
+    axis_point: Tuple[float, float, float]  # the point of the axis closest to the origin
+    axis_dir: Tuple[float, float, float]  # unit, sign-normalized
+
+
+class GeometryReport(BaseModel):
+    solids: int
+    shells: int
+    open_shells: int
+    is_valid: bool
+    volume: float
+    area: float
+    bbox_min: Tuple[float, float, float]
+    bbox_max: Tuple[float, float, float]
+    min_thickness: Optional[float]  # None: no ray hit the opposite wall
+    thickness_samples: int
+    cylinders: List[CylinderFeature] = []
+    check_s: float
+    issues: List[str]  # critical failures; empty if the geometry passed
+    warnings: List[str] = []  # advisory findings (thin walls), left to the critique
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    @property
+    def diagonal(self) -> float:
+        return sum((hi - lo) ** 2 for lo, hi in zip(self.bbox_min, self.bbox_max)) ** 0.5
+
+    @property
+    def size(self) -> Tuple[float, float, float]:
+        return tuple(round(hi - lo, 4) for lo, hi in zip(self.bbox_min, self.bbox_max))
+
+    def summary(self) -> str:
+        thickness = f"{self.min_thickness:.3f} mm" if self.min_thickness is not None else "n/a"
+        x, y, z = self.size
+        return (f"solids: {self.solids}, shells: {self.shells} ({self.open_shells} open), "
+                f"valid B-Rep: {self.is_valid}, volume: {self.volume:.3f} mm^3, surface area: {self.area:.3f} mm^2, "
+                f"bounding box: {x:g} x {y:g} x {z:g} mm, "
+                f"min wall thickness: {thickness} (from {self.thickness_samples} samples)"
+                + (f", full cylinders: {self.cylinder_summary()}" if self.cylinders else "")
+                + (f", warnings: {'; '.join(self.warnings)}" if self.warnings else ""))
+
+    def cylinder_summary(self) -> str:
+        groups = Counter((round(c.diameter, 3), c.hole) for c in self.cylinders)
+        return ", ".join(f"{count} x {diameter:g} mm diameter {'hole' if hole else 'boss'}{'s' if count > 1 else ''}"
+                         for (diameter, hole), count in sorted(groups.items(), key=lambda item: -item[0][0]))
+
+
+def _face_samples(face, budget: int):
+    """(point, inward direction) pairs on a face, at interior points of its UV range."""
+    from OCP.BRepAdaptor import BRepAdaptor_Surface
+    from OCP.BRepClass import BRepClass_FaceClassifier
+    from OCP.BRepLProp import BRepLProp_SLProps
+    from OCP.BRepTools import BRepTools
+    from OCP.TopAbs import TopAbs_IN, TopAbs_REVERSED
+    from OCP.gp import gp_Pnt2d
+
+    u0, u1, v0, v1 = BRepTools.UVBounds_s(face)
+    surface = BRepAdaptor_Surface(face)
+    reversed_face = face.Orientation() == TopAbs_REVERSED
+
+    samples = []
+    for fu in SAMPLE_FRACTIONS:
+        for fv in SAMPLE_FRACTIONS:
+            if len(samples) >= budget:
+                return samples
+            u, v = u0 + fu * (u1 - u0), v0 + fv * (v1 - v0)
+            if BRepClass_FaceClassifier(face, gp_Pnt2d(u, v), 1e-7).State() != TopAbs_IN:
+                continue  # inside a hole of the face
+            props = BRepLProp_SLProps(surface, u, v, 1, 1e-7)
+            if not props.IsNormalDefined():
+                continue
+            normal = props.Normal()
+            samples.append((props.Value(), normal if reversed_face else normal.Reversed()))
+    return samples
+
+
+def _face_neighbours(shape) -> Tuple[Any, List[set]]:
+    """The shape's faces as an indexed map, and per face index the indices of the faces sharing an edge with it."""
+    from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE
+    from OCP.TopExp import TopExp
+    from OCP.TopTools import TopTools_IndexedDataMapOfShapeListOfShape, TopTools_IndexedMapOfShape
+
+    face_map = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(shape, TopAbs_FACE, face_map)
+    edge_faces = TopTools_IndexedDataMapOfShapeListOfShape()
+    TopExp.MapShapesAndAncestors_s(shape, TopAbs_EDGE, TopAbs_FACE, edge_faces)
+
+    neighbours = [set() for _ in range(face_map.Extent() + 1)]  # 1-based, as the map
+    for i in range(1, edge_faces.Extent() + 1):
+        indices = {face_map.FindIndex(face) for face in edge_faces.FindFromIndex(i)}
+        for index in indices:
+            neighbours[index] |= indices
+    return face_map, neighbours
+
+
+def min_wall_thickness(shape, diagonal: float,
+                       budget: int = GEOMETRY_THICKNESS_SAMPLES) -> Tuple[Optional[float], int]:
+    """
+    Cast a ray inward from sample points on every face and measure the distance to the next wall.
+    Returns (minimum distance or None, number of samples).
+
+    Hits on the faces sharing an edge with the sampled one are skipped: a ray starting near an edge grazes the
+    adjacent face (a hole drilled at an angle, a chamfer), which measures the sampling position, not a wall.
+    """
+    from OCP.IntCurvesFace import IntCurvesFace_ShapeIntersector
+    from OCP.gp import gp_Lin
+
+    tolerance = 1e-6 * max(1.0, diagonal)
+    intersector = IntCurvesFace_ShapeIntersector()
+    intersector.Load(shape.wrapped, tolerance)
+    face_map, neighbours = _face_neighbours(shape.wrapped)
+
+    faces = shape.Faces()
+    per_face = max(1, budget // max(1, len(faces)))
+    thickness, n_samples = None, 0
+    for face in faces:
+        adjacent = neighbours[face_map.FindIndex(face.wrapped)] - {face_map.FindIndex(face.wrapped)}
+        for point, direction in _face_samples(face.wrapped, min(per_face, budget - n_samples)):
+            n_samples += 1
+            intersector.Perform(gp_Lin(point, direction), tolerance, float("inf"))
+            if not intersector.IsDone():
+                continue
+            hits = [intersector.WParameter(i) for i in range(1, intersector.NbPnt() + 1)
+                    if face_map.FindIndex(intersector.Face(i)) not in adjacent]
+            hits = [w for w in hits if w > 10 * tolerance]  # not the sample point itself
+            if hits and (thickness is None or min(hits) < thickness):
+                thickness = min(hits)
+        if n_samples >= budget:
+            break
+    return thickness, n_samples
+
+
+def cylinder_features(shape) -> List[CylinderFeature]:
+    """
+    Full cylinders of the shape: cylindrical faces grouped by axis, radius and side, kept when together they span
+    the whole circle (a hole is often split at its seam; fillets and partial arcs are left out).
+    """
+    from OCP.BRepAdaptor import BRepAdaptor_Surface
+    from OCP.BRepLProp import BRepLProp_SLProps
+    from OCP.BRepTools import BRepTools
+    from OCP.GeomAbs import GeomAbs_Cylinder
+    from OCP.TopAbs import TopAbs_REVERSED
+
+    spans = defaultdict(float)
+    for face in shape.Faces():
+        surface = BRepAdaptor_Surface(face.wrapped)
+        if surface.GetType() != GeomAbs_Cylinder:
+            continue
+        cylinder = surface.Cylinder()
+        u0, u1, v0, v1 = BRepTools.UVBounds_s(face.wrapped)
+        props = BRepLProp_SLProps(surface, (u0 + u1) / 2, (v0 + v1) / 2, 1, 1e-7)
+        if not props.IsNormalDefined():
+            continue
+
+        location, direction = cylinder.Location().XYZ(), cylinder.Axis().Direction().XYZ()
+        normal = props.Normal().XYZ()
+        if face.wrapped.Orientation() == TopAbs_REVERSED:
+            normal.Reverse()  # outward, away from the material
+        radial = props.Value().XYZ().Subtracted(location)
+        radial.Subtract(direction.Multiplied(radial.Dot(direction)))
+
+        axis = (direction.X(), direction.Y(), direction.Z())
+        if next(c for c in axis if abs(c) > 1e-9) < 0:
+            axis = tuple(-c for c in axis)
+        point = location.Subtracted(direction.Multiplied(location.Dot(direction)))
+        key = (round(2 * cylinder.Radius(), 4), radial.Dot(normal) < 0, tuple(round(c, 4) + 0.0 for c in axis),
+               tuple(round(c, 3) + 0.0 for c in (point.X(), point.Y(), point.Z())))  # + 0.0: no -0.0
+        spans[key] += u1 - u0
+
+    return [CylinderFeature(diameter=diameter, hole=hole, axis_point=point, axis_dir=axis)
+            for (diameter, hole, axis, point), span in spans.items() if span >= 2 * math.pi - 1e-3]
+
+
+def check_geometry(shape: Any, min_thickness: float = GEOMETRY_MIN_THICKNESS) -> GeometryReport:
+    """Measure `shape` (a cadquery `Shape`) and list the critical failures and the warnings."""
+    from OCP.BRep import BRep_Tool
+
+    start = time.perf_counter()
+    solids, shells = shape.Solids(), shape.Shells()
+    open_shells = sum(not BRep_Tool.IsClosed_s(shell.wrapped) for shell in shells)
+    is_valid = bool(shape.isValid())
+    volume, area = float(shape.Volume()), float(shape.Area())
+    bbox = shape.BoundingBox()  # the optimal box: slow on tori / splines, so computed once
+    thickness, n_samples = min_wall_thickness(shape, bbox.DiagonalLength) if solids else (None, 0)
+    min_thickness = min(min_thickness, GEOMETRY_MIN_THICKNESS_RATIO * bbox.DiagonalLength)
+    cylinders = cylinder_features(shape)
+
+    issues = []
+    if not solids:
+        issues.append("the model contains no solid (only faces / wires / shells)")
+    elif len(solids) > 1 and GEOMETRY_SINGLE_SOLID:
+        issues.append(f"the model is {len(solids)} disconnected solids; expected a single solid body "
+                      f"(volumes: {', '.join(f'{s.Volume():.3f}' for s in solids[:10])} mm^3)")
+    if not is_valid:
+        issues.append("the B-Rep is invalid (self-intersecting or malformed geometry, `isValid()` is False)")
+    if open_shells:
+        issues.append(f"{open_shells} of {len(shells)} shells are not closed (the body is not watertight)")
+    if solids and volume <= 0:
+        issues.append(f"the volume is {volume:.6f} mm^3 (degenerate or inside-out solid)")
+    warnings = []
+    if thickness is not None and thickness < min_thickness:
+        warnings.append(f"the thinnest wall is {thickness:.4f} mm, below the {min_thickness:.4g} mm minimum "
+                        f"(zero-thickness or near-zero wall)")
+
+    return GeometryReport(
+        solids=len(solids),
+        shells=len(shells),
+        open_shells=open_shells,
+        is_valid=is_valid,
+        volume=volume,
+        area=area,
+        bbox_min=(bbox.xmin, bbox.ymin, bbox.zmin),
+        bbox_max=(bbox.xmax, bbox.ymax, bbox.zmax),
+        min_thickness=thickness,
+        thickness_samples=n_samples,
+        cylinders=cylinders,
+        check_s=time.perf_counter() - start,
+        issues=issues,
+        warnings=warnings,
+    )
@@ -1,3 +1,16 @@
+from graph.async_nodes import (
+    astart_run,
+    aextract_human_message,
+    acompact_history,
+    aget_dimensions,
+    avalidate_dimensions,
+    aget_design_instructions,
+    aretrieve_context,
+    agenerate_cad_program,
+    avalidate_program,
+    aexporter,
+    adesign_critique
+)
 from graph.nodes import (
     extract_human_message,
     get_dimensions,
@@ -9,26 +22,23 @@ from graph.nodes import (
     exporter,
     design_critique
 )
+from graph.compaction import compact_history
+from graph.workspace import start_run
 from graph.state import CADState
 from langgraph.graph import StateGraph, END, START
 
 
-def build_graph():
+def _build(nodes: dict):
     workflow = StateGraph(CADState)
 
-    workflow.add_node("extract_human_msg", extract_human_message)
-    workflow.add_node("get_dimensions", get_dimensions)
-    workflow.add_node("validate_dimensions", validate_dimensions)
-    workflow.add_node("get_design_instructions", get_design_instructions)
-    workflow.add_node("retrieve_context", retrieve_context)
-    workflow.add_node("generate_cad_program", generate_cad_program)
-    workflow.add_node("validate_program", validate_program)
-    workflow.add_node("exporter", exporter)
-    workflow.add_node("design_critique", design_critique)
+    for name, node in nodes.items():
+        workflow.add_node(name, node)
 
     # workflow.set_entry_point("get_dimensions")
-    workflow.add_edge(START, "extract_human_msg")
-    workflow.add_edge("extract_human_msg", "get_dimensions")
+    workflow.add_edge(START, "start_run")
+    workflow.add_edge("start_run", "extract_human_msg")
+    workflow.add_edge("extract_human_msg", "compact_history")
+    workflow.add_edge("compact_history", "get_dimensions")
 
     workflow.add_edge("get_dimensions", "validate_dimensions")
 
@@ -49,24 +59,58 @@ def build_graph():
         "validate_program",
         lambda s: "ok" if s["is_code_valid"] else "feedback",
         {
-            "ok": "exporter",
+            "ok": "design_critique",
             "feedback": "generate_cad_program"
         }
     )
-    workflow.add_edge("exporter", "design_critique")
 
     workflow.add_conditional_edges(
         "design_critique",
-        lambda s: "ok" if s["is_review_passed"] == "valid" else "feedback",
+        lambda s: "ok" if s["is_review_passed"] else "feedback",
         {
-            "ok": END,
+            "ok": "exporter",
             "feedback": "generate_cad_program"
         }
     )
+    # files are written once, for the accepted design
+    workflow.add_edge("exporter", END)
 
     return workflow.compile()
 
 
+def build_graph():
+    return _build({
+        "start_run": start_run,
+        "extract_human_msg": extract_human_message,
+        "compact_history": compact_history,
+        "get_dimensions": get_dimensions,
+        "validate_dimensions": validate_dimensions,
+        "get_design_instructions": get_design_instructions,
+        "retrieve_context": retrieve_context,
+        "generate_cad_program": generate_cad_program,
+        "validate_program": validate_program,
+        "exporter": exporter,
+        "design_critique": design_critique,
+    })
+
+
+def build_async_graph():
+    """Same graph wired with the async nodes; run it with `await graph.ainvoke(...)`."""
+    return _build({
+        "start_run": astart_run,
+        "extract_human_msg": aextract_human_message,
+        "compact_history": acompact_history,
+        "get_dimensions": aget_dimensions,
+        "validate_dimensions": avalidate_dimensions,
+        "get_design_instructions": aget_design_instructions,
+        "retrieve_context": aretrieve_context,
+        "generate_cad_program": agenerate_cad_program,
+        "validate_program": avalidate_program,
+        "exporter": aexporter,
+        "design_critique": adesign_critique,
+    })
+
+
 class BuildGraph:
     def __init__(self, state):
         self.workflow = StateGraph(state)
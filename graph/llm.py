@@ -0,0 +1,149 @@
+"""
+Process-wide registry of the chat models used by the graph nodes (and of the knowledge-base embeddings).
+
+Building a fresh `ChatOpenAI` inside every node call throws away its HTTP connection pool, so every turn of the
+repair loops pays for new connections (and TLS handshakes). Nodes ask the registry for a model by *role* instead;
+each role is built once from its settings and shares a keep-alive `httpx` pool with every other role that talks to
+the same endpoint.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from pydantic import BaseModel
+
+from graph.llm_cache import cached_embeddings, get_response_cache
+
+
+class LLMSettings(BaseModel):
+    model: str
+    temperature: float = 0.0
+    timeout: float = 120.0
+    max_retries: int = 2
+    base_url: Optional[str] = None  # None -> OPENAI_BASE_URL / api.openai.com
+    cache: bool = True  # False: never serve or store responses in the response cache
+
+
+# per-role model settings, one entry per LLM-calling node
+LLM_PROFILES: Dict[str, LLMSettings] = {
+    "dimensions": LLMSettings(model="gpt-4.1"),
+    "design_instructions": LLMSettings(model="gpt-4.1"),
+    "cad_generation": LLMSettings(model="gpt-4o"),
+    "cad_candidates": LLMSettings(model="gpt-4o", temperature=0.7),  # best-of-N, needs diversity
+    "design_critique": LLMSettings(model="gpt-4o"),
+}
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+# keep-alive pool shared by every model that talks to the same endpoint
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=300.0)
+CONNECT_TIMEOUT = 10.0
+
+_lock = threading.RLock()
+_http_clients: Dict[Tuple[Optional[str], float], Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_chat_models: Dict[str, BaseChatModel] = {}
+_embeddings: Optional[Tuple[str, Embeddings]] = None
+
+
+def get_http_clients(base_url: Optional[str] = None, timeout: float = 120.0) \
+        -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Return the pooled (sync, async) httpx clients for an endpoint, creating them on first use.
+    The async client binds to the first event loop that uses it, so async callers should keep one long-lived loop.
+    """
+    key = (base_url, timeout)
+    with _lock:
+        if key not in _http_clients:
+            http_timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+            _http_clients[key] = (
+                httpx.Client(limits=POOL_LIMITS, timeout=http_timeout),
+                httpx.AsyncClient(limits=POOL_LIMITS, timeout=http_timeout),
+            )
+        return _http_clients[key]
+
+
+def build_llm(settings: LLMSettings) -> ChatOpenAI:
+    """Build a chat model for the given settings on top of the shared connection pool and response cache."""
+    http_client, http_async_client = get_http_clients(settings.base_url, settings.timeout)
+    return ChatOpenAI(
+        model=settings.model,
+        temperature=settings.temperature,
+        timeout=settings.timeout,
+        max_retries=settings.max_retries,
+        base_url=settings.base_url,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        cache=get_response_cache() if settings.cache else False,
+    )
+
+
+def get_llm(role: str) -> BaseChatModel:
+    """Return the shared chat model for a node role (see `LLM_PROFILES`)."""
+    llm = _chat_models.get(role)
+    if llm is not None:
+        return llm
+
+    if role not in LLM_PROFILES:
+        raise KeyError(f"Unknown LLM role `{role}`. Known roles: {sorted(LLM_PROFILES)}")
+
+    with _lock:
+        if role not in _chat_models:
+            _chat_models[role] = build_llm(LLM_PROFILES[role])
+        return _chat_models[role]
+
+
+def configure_llm(role: str, **overrides) -> LLMSettings:
+    """
+    Update (or create) the settings of a role. The cached model for that role is dropped and rebuilt on next use.
+    e.g. configure_llm("cad_generation", model="gpt-4.1", temperature=0.2)
+    """
+    with _lock:
+        current = LLM_PROFILES.get(role)
+        settings = current.model_copy(update=overrides) if current else LLMSettings(**overrides)
+        LLM_PROFILES[role] = settings
+        _chat_models.pop(role, None)
+    return settings
+
+
+def register_llm(role: str, llm: BaseChatModel) -> None:
+    """Install a ready-made model for a role (e.g. a fake for benchmarks), bypassing its settings."""
+    with _lock:
+        _chat_models[role] = llm
+
+
+def get_embeddings() -> Tuple[str, Embeddings]:
+    """(model name, embeddings) for the knowledge base: OpenAI embeddings behind the response cache by default."""
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            http_client, http_async_client = get_http_clients()
+            embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=http_client,
+                                          http_async_client=http_async_client)
+            # query embeddings go through the response cache so retrieval replays offline as well
+            _embeddings = (EMBEDDING_MODEL, cached_embeddings(embeddings, namespace=EMBEDDING_MODEL))
+        return _embeddings
+
+
+def register_embeddings(embeddings: Embeddings, name: Optional[str] = None) -> None:
+    """Install the embeddings used by the knowledge base (e.g. `FakeEmbeddings` for offline runs)."""
+    global _embeddings
+    with _lock:
+        _embeddings = (name or getattr(embeddings, "model", type(embeddings).__name__), embeddings)
+
+
+def reset_llm_registry() -> None:
+    """Drop every cached model and close the pooled HTTP clients."""
+    global _embeddings
+    with _lock:
+        clients = list(_http_clients.values())
+        _http_clients.clear()
+        _chat_models.clear()
+        _embeddings = None
+
+    for http_client, _ in clients:
+        http_client.close()
+    # async clients hold no sockets until used from an event loop; closing them needs one, so let GC handle it
@@ -0,0 +1,215 @@
+"""
+Content-addressed on-disk cache for LLM responses (and query embeddings).
+
+Entries are keyed on sha256(model + invocation parameters + serialized prompt), which is exactly what LangChain hands
+to a `BaseCache`, so plugging it into the chat models in `graph.llm` covers every LLM call the nodes make. The cache
+is bounded in bytes and evicts least-recently-used entries (recency = file mtime, bumped on every hit).
+
+Modes (env `LLM_CACHE_MODE`):
+- off:        no caching
+- read_write: serve hits, call the provider on misses and store the result (default)
+- replay:     serve hits only; a miss raises `LLMCacheMissError` instead of touching the network, so a recorded
+              graph run can be replayed offline with zero provider latency
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+CACHE_MODES = ("off", "read_write", "replay")
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "read_write")
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache/llm")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class LLMCacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class DiskLLMCache(BaseCache):
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 mode: str = LLM_CACHE_MODE):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode `{mode}`. Expected one of {CACHE_MODES}")
+
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(p.stat().st_size for p in self._entries())
+
+    # ----------------------------
+    # key / storage helpers
+    # ----------------------------
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _entries(self) -> List[Path]:
+        return list(self.cache_dir.glob("*/*.json"))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the stored payload for `key` (bumping its recency) or None. Counts a hit/miss."""
+        path = self._path(key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # LRU recency
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise LLMCacheMissError(f"No recorded response for cache key {key[:12]}… in `{self.cache_dir}`")
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: Any) -> None:
+        if self.mode != "read_write":
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(payload).encode("utf-8")
+
+        # write-then-rename so concurrent readers never see a partial entry
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        previous = path.stat().st_size if path.exists() else 0
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - previous
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until the cache is back under 90% of its byte budget."""
+        with self._lock:
+            entries = []
+            for p in self._entries():
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            entries.sort()
+
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            for _, size, p in entries:
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+            self._total_bytes = total
+
+    # ----------------------------
+    # BaseCache interface
+    # ----------------------------
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        payload = self.get(self.make_key("llm", llm_string, prompt))
+        if payload is None:
+            return None
+        generations = []
+        for g in payload["generations"]:
+            if "message" in g:
+                message = messages_from_dict([g["message"]])[0]
+                message.response_metadata["cache_hit"] = True  # picked up by utils.tracing
+                generations.append(ChatGeneration(message=message))
+            else:
+                generations.append(Generation(text=g["text"]))
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        generations = [
+            {"message": message_to_dict(g.message)} if isinstance(g, ChatGeneration) else {"text": g.text}
+            for g in return_val
+        ]
+        self.put(self.make_key("llm", llm_string, prompt), {"generations": generations})
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            for p in self._entries():
+                p.unlink(missing_ok=True)
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that stores query embeddings in the same cache, so retrieval also replays offline.
+    Document embeddings (ingestion) are passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: DiskLLMCache, namespace: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache.make_key("embedding", self.namespace, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+
+_response_cache: Optional[DiskLLMCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[DiskLLMCache]:
+    """Process-wide response cache, or None when `LLM_CACHE_MODE=off`."""
+    global _response_cache
+    if LLM_CACHE_MODE == "off":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = DiskLLMCache()
+        return _response_cache
+
+
+def cached_embeddings(embeddings: Embeddings, namespace: str) -> Embeddings:
+    cache = get_response_cache()
+    return CachedEmbeddings(embeddings, cache, namespace) if cache is not None else embeddings
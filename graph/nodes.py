@@ -1,26 +1,52 @@
-import ast
 import os
-import shutil
-import sys
-import warnings
+import time
 from pathlib import Path
-from typing import Any
-
-import cadquery as cq
+from typing import Dict, Optional
+
+from graph.artifacts import write_artifacts
+from graph.best_of_n import BEST_OF_N, run_best_of_n
+from graph.compaction import select_history
+from graph.conformance import DIMENSION_REJECT, check_conformance
+from graph.critique_gate import CRITIQUE_GATE, CRITIQUE_GATE_SKIP_REVIEW, get_gate_stats, run_gate
+from graph.critique_images import (
+    CRITIQUE_IMAGE_DETAIL,
+    CRITIQUE_IMAGE_FORMAT,
+    CRITIQUE_IMAGE_GRAYSCALE,
+    CRITIQUE_IMAGE_LAYOUT,
+    CRITIQUE_IMAGE_QUALITY,
+    encode_views,
+    image_parts,
+    view_size,
+    views_tokens,
+)
 from graph.data_models import DesignInstructions
+from graph.exec_cache import get_execution_cache
+from graph.execution import execute_program
+from graph.llm import get_llm
+from graph.render_cache import get_render_cache
+from graph.sandbox import EXEC_SANDBOX, get_execution_pool
 from graph.state import CodeInsights, DesignCritiqueResult
 from langchain_core.messages import AIMessage
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-from utils.generate_screenshots import generate_stl_screenshots
-from utils.utils import parse_json, strip_markdown_code_fences, load_and_format_prompt
+from langchain_core.prompts import ChatPromptTemplate
+from trimesh import Trimesh
+from utils.code_stream import UnrecoverableProgramError, stream_program
+from utils.decimate import RENDER_TRIANGLE_BUDGET
+from utils.generate_screenshots import compose_views, get_view_angles, render_labelled_views
+from utils.prompts import get_prompt_registry
+from utils.utils import parse_json, strip_markdown_code_fences
 from vector_db import setup_or_initialize_kb
 
 
 # from rich.traceback import install
 # install()
 
+# all `prompts/*.md` templates, loaded and compiled once (hot-reloaded when a file changes)
+PROMPTS = get_prompt_registry()
+
+# stream `generate_cad_program` completions and abort as soon as the partial program is unrecoverable
+STREAM_CAD_GENERATION = os.getenv("STREAM_CAD_GENERATION", "1") == "1"
+
 
 def extract_human_message(state):
     messages = state.get("messages", [])
@@ -31,22 +57,15 @@ def extract_human_message(state):
     return {"human_messages": human_texts}
 
 
-def get_dimensions(state):
-    llm = ChatOpenAI(
-        model="gpt-4.1",
-        temperature=0.0
-    )
+def _dimensions_chain():
+    llm = get_llm("dimensions")
 
-    system_prompt = load_and_format_prompt("prompts/prompt_to_dims.md")
+    # system prompt + `messages` placeholder, pulls messages from state automatically
+    prompt = PROMPTS.template("prompt_to_dims", with_history=True)
+    return prompt | llm
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        MessagesPlaceholder("messages")  # pulls messages from state automatically
-    ])
-    chain = prompt | llm
 
-    # invoke the chain with current messages
-    response = chain.invoke({"messages": state["messages"]})
+def _dimensions_update(response):
     # parse JSON output
     args = parse_json(response)
 
@@ -58,6 +77,12 @@ def get_dimensions(state):
     }
 
 
+def get_dimensions(state):
+    # invoke the chain with current messages
+    response = _dimensions_chain().invoke({"messages": select_history(state["messages"], "get_dimensions")})
+    return _dimensions_update(response)
+
+
 def validate_dimensions(state):
     # todo: add more validation logics here
     # todo: ask LLM whether these dims looks realistic or not. extract dims if present in the prompt else generate
@@ -72,21 +97,15 @@ def validate_dimensions(state):
     return state
 
 
-def get_design_instructions(state):
-    llm = ChatOpenAI(
-        model="gpt-4.1",
-        temperature=0.0
-    ).with_structured_output(DesignInstructions)
+def _design_instructions_chain():
+    llm = get_llm("design_instructions").with_structured_output(DesignInstructions)
 
-    system_prompt = load_and_format_prompt("prompts/design_instructions.md")
+    # system prompt + `messages` placeholder, pull prior messages from state
+    prompt = PROMPTS.template("design_instructions", with_history=True)
+    return prompt | llm
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        MessagesPlaceholder("messages")  # pull prior messages from state
-    ])
 
-    chain = prompt | llm
-    design_obj: DesignInstructions = chain.invoke({"messages": state["messages"]})
+def _design_instructions_update(design_obj: DesignInstructions):
     print("DESIGN INSTRUCTIONS:", design_obj.design_instructions)
 
     return {
@@ -97,6 +116,12 @@ def get_design_instructions(state):
     }
 
 
+def get_design_instructions(state):
+    history = select_history(state["messages"], "get_design_instructions")
+    design_obj: DesignInstructions = _design_instructions_chain().invoke({"messages": history})
+    return _design_instructions_update(design_obj)
+
+
 def retrieve_context(state):
     """
     Retrieve CadQuery documentation and examples to assist code generation.
@@ -118,12 +143,12 @@ def retrieve_context(state):
     return {"cadquery_context": context}
 
 
-def generate_cad_program(state):
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0)
-
+def _generation_prompt(state):
+    """Pick the generation / code-fix prompt for the current state. Returns (prompt, variables)."""
     # determine prompt and variables based on state
-    if state.get('is_code_valid', None) is False:  # represents flow for Code failure
-        prompt_path = "prompts/cad_code_validation.md"
+    # represents flow for Code failure, and for a rejected design (the critique's issues, see `_critique_repair`)
+    if state.get('is_code_valid', None) is False:
+        prompt_name = "cad_code_validation"
         variables = {
             "cadquery_program": state["cadquery_program"],
             "error_stack": state["code_insights"].error_stack,
@@ -131,16 +156,8 @@ def generate_cad_program(state):
             "warning_msgs": state["code_insights"].warning_msgs,
         }
 
-    elif state.get('is_review_passed', None) is False:  # represents flow for Review failure
-        prompt_path = "prompts/cad_review_fix.md"
-        variables = {
-            "previous_code": state["generated_code"],
-            "review_feedback": state["review_feedback"],
-            # todo: ... other variables for this case
-        }
-
     else:
-        prompt_path = "prompts/cad_generation.md"
+        prompt_name = "cad_generation"
         variables = {
             "docs_and_exs": state["cadquery_context"],
             "dimensions": state["dimensions"],
@@ -150,202 +167,134 @@ def generate_cad_program(state):
             ),
         }
 
-    # Single chain creation and invocation
-    system_prompt = load_and_format_prompt(prompt_path)
-    prompt = ChatPromptTemplate.from_messages([("system", system_prompt)])
-    chain = prompt | llm
-    response = chain.invoke(variables)
+    return PROMPTS.template(prompt_name), variables
+
+
+def _complete_program(prompt, llm, variables) -> str:
+    """Run one generation and return the program with markdown fences stripped."""
+    if STREAM_CAD_GENERATION:
+        try:
+            return stream_program(prompt | llm.bind(stream=True), variables)
+        except UnrecoverableProgramError as e:
+            # hand the partial program to validation, its syntax check produces the repair insights
+            print(f"Aborted streaming generation: {e}")
+            return e.program
+
+    response = (prompt | llm).invoke(variables)
+    return strip_markdown_code_fences(response.content)
+
+
+def generate_cad_program(state):
+    prompt, variables = _generation_prompt(state)
+
+    n_candidates = state.get("n_candidates") or BEST_OF_N
+    if n_candidates > 1:
+        # distinct seeds keep candidates diverse and give each its own response-cache entry
+        return run_best_of_n(
+            lambda i: _complete_program(prompt, get_llm("cad_candidates").bind(seed=i), variables),
+            n=n_candidates,
+            check=lambda update: _check_dimensions(update, update.get("geometry"), state.get("dimensions")),
+        )
 
-    generated_prog: str = strip_markdown_code_fences(response.content)
+    # Single chain creation and invocation
+    generated_prog = _complete_program(prompt, get_llm("cad_generation"), variables)
     # print(f"Exiting generated_cad_program node with this code: \n{generated_prog}", end="\n==============\n")
 
     return {
 
         "cadquery_program": generated_prog,
+        "prevalidated_program": None,
+    }
+
+
+def _check_dimensions(update: dict, geometry, dimensions: dict) -> dict:
+    """
+    `update` of a validated program, rejected with `DIMENSION_REJECT=1` (with the numbers, for the repair prompt) if
+    its measured geometry is far off the requested dimensions (see `graph.conformance`). Only direct measurements
+    reject: the dimensions mapped by name (cylinders, ambiguous extents) are left to the critique.
+    """
+    if not DIMENSION_REJECT or not update.get("is_code_valid") or geometry is None:
+        return update
+    report = check_conformance(geometry, dimensions)
+    print(f"Dimension conformance: {report.counts()}")
+    if not report.hard_failures:
+        return update
+
+    error_stack = "Dimension check failed (the model does not match the requested dimensions):\n" \
+                  + "\n".join(f"- {check.describe()}" for check in report.hard_failures) \
+                  + f"\nAll dimensions:\n{report.summary()}\nMeasured: {geometry.summary()}"
+    print(error_stack)
+    return {
+        **update,
+        "is_code_valid": False,
+        "code_insights": CodeInsights(
+            error_stack=error_stack,
+            line_no=None,
+            warning_msgs=update["code_insights"].warning_msgs,
+        ),
+        "artifacts": None,
     }
 
 
 def validate_program(state):
     prog = state.get("cadquery_program")
+    if prog is not None and prog == state.get("prevalidated_program"):
+        # best-of-N generation already ran this exact program in a worker process
+        update = {"is_code_valid": state["is_code_valid"], "code_insights": state["code_insights"]}
+        return _check_dimensions(update, state.get("geometry"), state.get("dimensions"))
 
-    expected_files = ("object.stl", "object.step")
-    warning_msgs = []
-
-    # ----------------------------
-    # 1. Syntax pre-check
-    # ----------------------------
-    try:
-        ast.parse(prog)
-    except SyntaxError as e:
-        print(f"SyntaxError at line {e.lineno}: {e.msg}")
-        return {
-            "is_code_valid": False,
-            "code_insights": CodeInsights(
-                error_stack=f"SyntaxError at line {e.lineno}: {e.msg}",
-                line_no=e.lineno,
-                warning_msgs=warning_msgs,
-            )}
-
-    # ----------------------------
-    # 2. Soft CadQuery import check
-    # ----------------------------
-    try:
-        tree = ast.parse(prog)
-        has_cq_import = any(
-            isinstance(node, (ast.Import, ast.ImportFrom)) and
-            (
-                    any(
-                        getattr(alias, "name", "").startswith("cadquery")
-                        for alias in getattr(node, "names", [])
-                    ) or
-                    getattr(node, "module", "").startswith("cadquery")
-            )
-            for node in ast.walk(tree)
-        )
-        if not has_cq_import:
-            warning_msgs.append(
-                "CadQuery import not found. Expected: import cadquery as cq"
-            )
-    except Exception:  # type: ignore
-        # Defensive, ignore
-        pass
-
-    # ----------------------------
-    # 3. Cleanup previous outputs
-    # ----------------------------
-    for f in expected_files:
-        if os.path.exists(f):
-            os.remove(f)
-
-    # ----------------------------
-    # 4. Execute code safely
-    # ----------------------------
-    exec_globals = {
-        "__builtins__": __builtins__,
-        "cq": cq,
-    }
-    exec_locals = {}
-
-    runtime_warnings = []
-    with warnings.catch_warnings(record=True) as w:
-        warnings.simplefilter("always")
-        try:
-            exec(prog, exec_globals)
-            runtime_warnings.extend([str(warn.message) for warn in w])
-        except Exception:
-            exc_type, exc_value, exc_tb = sys.exc_info()
-            # Walk the traceback to the frame inside the executed code
-            tb = exc_tb
-            while tb.tb_next is not None:
-                tb = tb.tb_next
-            # Get the line number in the executed string
-            lineno = tb.tb_lineno
-            # Extract the actual line from the string
-            line = prog.splitlines()[lineno - 1] if lineno <= len(prog.splitlines()) else "<line not found>"
-            print(f"{exc_type.__name__} at line {lineno}: `{line.strip()}`\nError message: {exc_value}")
-            return {
-                "is_code_valid": False,
-                "code_insights": CodeInsights(
-                    error_stack=f"{exc_type.__name__} at line {lineno}: `{line.strip()}`\nError message: {exc_value}",
-                    line_no=lineno,
-                    warning_msgs=warning_msgs + runtime_warnings,
-                )}
-
-    # ----------------------------
-    # 5. Validate `model` contract
-    # ----------------------------
-    model: Any = exec_locals.get("model") or exec_globals.get("model")
-    if model is None:
-        print("No `model` object was created. The final CAD object must be assigned to `model`.")
-        return {
-            "is_code_valid": False,
-            "code_insights": CodeInsights(
-                error_stack="No `model` object was created. The final CAD object must be assigned to `model`.",
-                line_no=None,
-                warning_msgs=warning_msgs + runtime_warnings,
-            )}
-
-    # Safe .val() geometry check
-    if not hasattr(model, "val"):
-        print("`model` exists but does not have a `.val()` method (invalid geometry).")
-        return {
-            "is_code_valid": False,
-            "code_insights": CodeInsights(
-                error_stack="`model` exists but does not have a `.val()` method (invalid geometry).",
-                line_no=None,
-                warning_msgs=warning_msgs + runtime_warnings,
-            )}
-
-    # Optional: trigger .val() to catch runtime CAD errors
-    try:
-        model.val()
-    except Exception as e:
-        print(f"Geometry error in `model.val()`: {str(e)}")
-        return {
-            "is_code_valid": False,
-            "code_insights": CodeInsights(
-                error_stack=f"Geometry error in `model.val()`: {str(e)}",
-                line_no=None,
-                warning_msgs=warning_msgs + runtime_warnings,
-            )}
-
-    # ----------------------------
-    # 6. Validate exports
-    # ----------------------------
-    missing_files = [f for f in expected_files if not os.path.exists(f)]
-    if missing_files:
-        print(f"Missing exported files: {missing_files}")
-        return {
-            "is_code_valid": False,
-            "code_insights": CodeInsights(
-                error_stack=f"Missing exported files: {missing_files}",
-                line_no=None,
-                warning_msgs=warning_msgs + runtime_warnings,
-            )
-        }
+    if EXEC_SANDBOX:
+        update = get_execution_pool().run(prog)["update"]
+    else:
+        def execute():
+            started = time.perf_counter()
+            update, _ = execute_program(prog)
+            return {"update": update, "validate_s": time.perf_counter() - started}
 
-    all_warnings = warning_msgs + runtime_warnings
+        update = get_execution_cache().run(prog, execute)["update"]
 
-    # Success
-    return {
-        "is_code_valid": True,
-        "code_insights": CodeInsights(
-            error_stack=None,
-            line_no=None,
-            warning_msgs=all_warnings,
-        )
-    }
+    # the validated model stays in memory (`artifacts`) until the design is accepted and exported
+    return _check_dimensions({"artifacts": None, "geometry": None, **update}, update.get("geometry"),
+                             state.get("dimensions"))
 
 
 def exporter(state):
-    output_dir = "output"
+    """Write the accepted design's files (the only time they touch the disk)."""
+    exported_files = write_artifacts(state["artifacts"], state["output_dir"])
 
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    if state.get("render_views"):
+        view_path = Path(state["output_dir"]) / "view.png"
+        view_path.write_bytes(compose_views(state["render_views"]))
+        exported_files["png"] = str(view_path)
 
-    source_files = ["object.stl", "object.step"]
-    exported_files = {}
+    print(f"Exported {sorted(exported_files)} to {state['output_dir']}")
+    return {"exported_files": exported_files}
 
-    for filename in source_files:
-        src = Path(filename)
-        if src.exists():
-            dest = output_path / filename
-            shutil.move(src, dest)
-            exported_files[src.suffix.lstrip(".")] = str(dest)
 
-    return {"exported_files": exported_files}
+def _render_views(state) -> Dict[str, bytes]:
+    """
+    Encoded critique images of the validated model, rendered straight from its in-memory mesh (CPU-bound) unless
+    cached: one per view, or the composite (see `graph.critique_images`).
+    """
+    artifacts = state["artifacts"]
+    params = {"size": view_size(), "triangle_budget": RENDER_TRIANGLE_BUDGET}
+    encoding = {"layout": CRITIQUE_IMAGE_LAYOUT, "fmt": CRITIQUE_IMAGE_FORMAT, "quality": CRITIQUE_IMAGE_QUALITY,
+                "grayscale": CRITIQUE_IMAGE_GRAYSCALE}
 
+    def render() -> Dict[str, bytes]:
+        mesh = Trimesh(vertices=artifacts.vertices, faces=artifacts.faces, process=False)
+        return encode_views(render_labelled_views(mesh, **params), **encoding)
 
-def design_critique(state):
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0)
+    return get_render_cache().run(artifacts.vertices, artifacts.faces, render, views=get_view_angles(), **params,
+                                  **encoding)
 
-    # Load system prompt from markdown
-    prompt_text = load_and_format_prompt("prompts/cad_design_critique.md")
 
-    object_img_base64_str = generate_stl_screenshots("output/object.stl", return_base64=True, dpi=80,
-                                                     output_filepath="output/view.png")
+def _critique_messages(state, views: Dict[str, bytes]):
+    """Build the critique prompt messages: the review inputs as text, then the rendered views as images."""
+    # Preloaded system prompt text
+    prompt_text = PROMPTS.text("cad_design_critique")
 
-    # Include all inputs inside the system prompt
+    # Include all text inputs inside the system prompt
     full_prompt = f"""
 {prompt_text}
 
@@ -356,19 +305,91 @@ def design_critique(state):
 ### USER REQUEST
 {state['human_messages']}
 
-### IMAGES (base64, may be empty)
-{object_img_base64_str}
+### MEASURED GEOMETRY
+{state['geometry'].summary() if state.get('geometry') else "n/a"}
+
+### DIMENSION CONFORMANCE (requested vs. measured)
+{check_conformance(state['geometry'], state.get('dimensions')).summary() if state.get('geometry') else "n/a"}
+
+### IMAGES
+the rendered views, attached below
 """
 
-    # System-only message
     prompt = ChatPromptTemplate.from_messages([("system", full_prompt)])
+    images = HumanMessage(content=[{"type": "text", "text": "Rendered views of the model:"}, *image_parts(views)])
+    return [*prompt.format_messages(), images]
+
+
+def _gate_critique(state) -> Optional[DesignCritiqueResult]:
+    """The critique decided by the deterministic gate (see `graph.critique_gate`), or None to run the LLM review."""
+    if not CRITIQUE_GATE:
+        return None
+    decision = run_gate(state.get("geometry"), state.get("dimensions"))
+    skipped = decision.verdict == "fail" or (decision.verdict == "pass" and CRITIQUE_GATE_SKIP_REVIEW)
+    saved_s = get_gate_stats().record_decision(decision, skipped)
+    if not skipped:
+        outcome = "running the review"
+    else:
+        outcome = f"skipped the review (~{saved_s:.2f}s saved)" if saved_s is not None \
+            else "skipped the review (no review timed yet)"
+    print(f"Critique gate: {decision.verdict} in {decision.check_s * 1000:.2f} ms, {outcome}\n{decision.summary()}")
+    if not skipped:
+        return None
+    summary = "Rejected by the pre-critique measurements." if decision.verdict == "fail" \
+        else "Accepted by the pre-critique measurements: " + "; ".join(decision.notes) + "."
+    return DesignCritiqueResult(status=decision.verdict == "pass", summary=summary, issues=decision.issues)
 
-    # Wrap LLM to produce structured output
-    structured_llm = llm.with_structured_output(DesignCritiqueResult)
 
-    # Invoke LLM and get structured result
-    critique_result = structured_llm.invoke(prompt.format_messages())
+def _critique_repair(critique_result: DesignCritiqueResult) -> dict:
+    """
+    A rejected design goes back to generation as a failed program: the critique's issues are the error stack of the
+    code-fix prompt, next to the program they are about.
+    """
+    if critique_result.status:
+        return {}
+    error_stack = f"Design critique failed: {critique_result.summary}\n" + "\n".join(
+        f"- [{issue.severity}] {issue.category}: {issue.description} Suggestion: {issue.suggestion}"
+        for issue in critique_result.issues)
+    return {
+        "is_code_valid": False,
+        "code_insights": CodeInsights(error_stack=error_stack, line_no=None, warning_msgs=[]),
+    }
+
+
+def _gated_update(critique_result: DesignCritiqueResult, views: Optional[Dict[str, bytes]]):
+    print(critique_result)
+    return {"design_critique": critique_result, "is_review_passed": critique_result.status, "render_views": views,
+            **_critique_repair(critique_result)}
+
+
+def _critique_update(output, views: Dict[str, bytes]):
+    """State update from the raw + parsed structured output, reporting what the prompt and its images cost."""
+    critique_result = output["parsed"]
+    if critique_result is None:
+        raise output["parsing_error"] or ValueError("The critique returned no DesignCritiqueResult")
+    usage = getattr(output["raw"], "usage_metadata", None) or {}
+    print(f"Critique prompt: {usage.get('input_tokens', 'n/a')} input tokens, ~{views_tokens(views)} of them for "
+          f"{len(views)} image(s) at {CRITIQUE_IMAGE_DETAIL} detail")
     print(critique_result)
 
     # Update state
-    return {"design_critique": critique_result, "is_review_passed": critique_result.status}
+    return {"design_critique": critique_result, "is_review_passed": critique_result.status, "render_views": views,
+            **_critique_repair(critique_result)}
+
+
+def design_critique(state):
+    gated = _gate_critique(state)
+    if gated is not None:
+        # an accepted design still exports its views (view.png); a rejected one isn't worth rendering
+        return _gated_update(gated, _render_views(state) if gated.status else None)
+
+    views = _render_views(state)
+
+    # Wrap LLM to produce structured output (with the raw message, for its token usage)
+    structured_llm = get_llm("design_critique").with_structured_output(DesignCritiqueResult, include_raw=True)
+
+    # Invoke LLM and get structured result
+    start = time.perf_counter()
+    output = structured_llm.invoke(_critique_messages(state, views))
+    get_gate_stats().record_review(time.perf_counter() - start)
+    return _critique_update(output, views)
@@ -0,0 +1,119 @@
+"""
+Cache of critique screenshots, keyed on the mesh content and the render parameters.
+
+Every critique pass renders the ISO / FRONT / TOP / SIDE views of the current model, but repeat critiques, best-of-N
+candidates that converge on the same design and follow-up turns that don't touch the geometry hand over the same mesh.
+The key hashes the vertex / face buffers together with image size, views and triangle budget, so an unchanged mesh is
+never rendered twice. Entries are evicted least-recently-used once `RENDER_CACHE_MAX_BYTES` of PNG data is exceeded.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 2 ** 20)))  # 0 disables the cache
+ENTRY_OVERHEAD_BYTES = 256  # key, timings, bookkeeping
+
+
+def render_key(vertices: np.ndarray, faces: np.ndarray, **params: Any) -> str:
+    """Hash of the mesh buffers (dtype, shape and content) and the JSON-serializable render parameters."""
+    digest = hashlib.blake2b(digest_size=32)
+    for array in (vertices, faces):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self.saved_s = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Dict[str, bytes]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_s += entry["render_s"]
+        print(f"Render cache hit: skipped a {entry['render_s']:.2f}s render")
+        return entry["views"]
+
+    def put(self, key: str, views: Dict[str, bytes], render_s: float) -> None:
+        if not self.enabled:
+            return
+        entry = {"views": views, "render_s": render_s,
+                 "bytes": sum(len(png) for png in views.values()) + ENTRY_OVERHEAD_BYTES}
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous["bytes"]
+            self._entries[key] = entry
+            self._bytes += entry["bytes"]
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["bytes"]
+                self.evictions += 1
+
+    def run(self, vertices: np.ndarray, faces: np.ndarray, render: Callable[[], Dict[str, bytes]],
+            **params: Any) -> Dict[str, bytes]:
+        """View name -> PNG of the mesh: cached, or `render()` (which must depend only on the mesh and `params`)."""
+        key = render_key(vertices, faces, **params) if self.enabled else None
+        cached = self.get(key) if key is not None else None
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        views = render()
+        if key is not None:
+            self.put(key, views, time.perf_counter() - start)
+        return views
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "saved_s": round(self.saved_s, 3),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
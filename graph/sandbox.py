@@ -0,0 +1,351 @@
+"""
+Sandboxed execution of generated CadQuery programs in a pool of pre-forked worker processes.
+
+Each worker imports `cadquery` once at start-up (the multi-second import is paid off the request path) and then runs
+programs one at a time in a scratch directory, under:
+
+- a wall-clock limit, enforced by the parent: a worker that overruns it is killed and replaced,
+- a CPU-time limit (`RLIMIT_CPU`, raised as an exception inside the program),
+- a memory limit (`RLIMIT_AS`, on top of the worker's footprint after the `cadquery` import).
+
+Workers are recycled after `EXEC_MAX_JOBS_PER_WORKER` programs so leaked OCC shapes don't accumulate. Every outcome,
+including timeouts and crashed workers, comes back as the usual `is_code_valid` / `code_insights` state update.
+Outcomes are cached by normalized program (see `graph.exec_cache`), so a repeated program never reaches a worker.
+"""
+
+import atexit
+import gc
+import os
+import queue
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import get_context
+from typing import Any, Dict, Iterable, List, Optional
+
+from graph.exec_cache import get_execution_cache
+from graph.state import CodeInsights
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock limit applies
+    resource = None
+
+EXEC_SANDBOX = os.getenv("EXEC_SANDBOX", "1") == "1"  # 0: exec generated programs in the main process
+EXEC_POOL_SIZE = int(os.getenv("EXEC_POOL_SIZE", "2"))
+EXEC_MAX_JOBS_PER_WORKER = int(os.getenv("EXEC_MAX_JOBS_PER_WORKER", "50"))
+EXEC_WALL_SECONDS = float(os.getenv("EXEC_WALL_SECONDS", "60"))
+EXEC_CPU_SECONDS = int(os.getenv("EXEC_CPU_SECONDS", "45"))
+EXEC_MEMORY_MB = int(os.getenv("EXEC_MEMORY_MB", "2048"))
+WORKER_STARTUP_SECONDS = 120.0
+
+_mp = get_context("spawn")
+
+
+class CPUTimeLimitExceeded(Exception):
+    pass
+
+
+# ----------------------------
+# worker process
+# ----------------------------
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeLimitExceeded("program exceeded the CPU time limit of the execution sandbox")
+
+
+def _vm_size_bytes() -> int:
+    try:
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _set_limits(memory_mb: int) -> None:
+    if resource is None:
+        return
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (_vm_size_bytes() + memory_mb * 2 ** 20, hard))
+    except (ValueError, OSError):  # e.g. macOS does not enforce RLIMIT_AS
+        pass
+
+
+def _cpu_limit(seconds: Optional[int]) -> None:
+    """Arm (or with None, disarm) the CPU-time soft limit relative to the CPU this worker has used so far."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + seconds + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run_program(prog: str, cpu_seconds: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run one program in its own scratch directory and ship back the outcome:
+    `update` (state update, with the in-memory `artifacts` on success), `geometry` and `validate_s`.
+    """
+    from graph.execution import execute_program
+
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    geometry = None
+
+    with tempfile.TemporaryDirectory(prefix="cad-exec-") as tmp:
+        os.chdir(tmp)
+        _cpu_limit(cpu_seconds)
+        try:
+            update, _ = execute_program(prog)
+            if update.get("geometry") is not None:
+                geometry = update["geometry"].model_dump()
+        finally:
+            _cpu_limit(None)
+            os.chdir(cwd)
+
+    return {"update": update, "geometry": geometry, "validate_s": time.perf_counter() - start}
+
+
+def _worker_main(conn, cpu_seconds: int, memory_mb: int) -> None:
+    import graph.execution  # noqa: F401  (imports cadquery: the slow part, paid once per worker)
+
+    _set_limits(memory_mb)
+    conn.send("ready")
+
+    while True:
+        try:
+            prog = conn.recv()
+        except EOFError:
+            break
+        if prog is None:
+            break
+        conn.send(run_program(prog, cpu_seconds))
+        gc.collect()  # release the job's OCC shapes before the next one
+
+
+# ----------------------------
+# pool (parent process)
+# ----------------------------
+def _failure(error_stack: str) -> Dict[str, Any]:
+    print(error_stack)
+    update = {"is_code_valid": False,
+              "code_insights": CodeInsights(error_stack=error_stack, line_no=None, warning_msgs=[])}
+    return {"update": update, "geometry": None, "validate_s": 0.0, "infra_error": True}
+
+
+class _Worker:
+    """One worker process, driven by its own dispatcher thread."""
+
+    def __init__(self, pool: "ExecutionPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.ready = threading.Event()
+        self.jobs = 0
+        self._spawn()  # pre-fork: the cadquery import starts now, not on the first job
+        self.thread = threading.Thread(target=self._loop, name=f"cad-exec-{index}", daemon=True)
+        self.thread.start()
+
+    def _spawn(self) -> None:
+        self.conn, child_conn = _mp.Pipe()
+        self.process = _mp.Process(target=_worker_main, name=f"cad-exec-worker-{self.index}", daemon=True,
+                                   args=(child_conn, self.pool.cpu_seconds, self.pool.memory_mb))
+        self.process.start()
+        child_conn.close()
+        self.ready.clear()
+        self.jobs = 0
+
+    def _kill(self) -> None:
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+
+    def _stop(self) -> None:
+        """Ask the worker to exit after its current job, then make sure it is gone."""
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=5)
+        except (BrokenPipeError, OSError):
+            pass
+        self._kill()
+
+    def _recycle(self, reason: str) -> None:
+        if reason == "max_jobs":
+            self._stop()
+        else:
+            self._kill()
+        self.pool._count(reason)
+        self._spawn()
+
+    def _wait_ready(self) -> bool:
+        if self.ready.is_set():
+            return True
+        try:
+            if self.conn.poll(WORKER_STARTUP_SECONDS) and self.conn.recv() == "ready":
+                self.ready.set()
+        except EOFError:
+            pass
+        return self.ready.is_set()
+
+    def _run(self, prog: str) -> Dict[str, Any]:
+        self.conn.send(prog)
+        if not self.conn.poll(self.pool.wall_seconds):
+            self._recycle("timeouts")
+            return _failure(f"TimeoutError: program exceeded the {self.pool.wall_seconds:g}s wall-clock limit "
+                            f"and was killed (infinite loop, or a sweep/boolean too expensive to finish?)")
+        try:
+            outcome = self.conn.recv()
+        except EOFError:
+            self.process.join(timeout=1)
+            exitcode = self.process.exitcode
+            self._recycle("crashes")
+            return _failure(f"WorkerCrash: the program crashed the execution process (exit code {exitcode}); "
+                            f"likely the {self.pool.memory_mb}MB memory limit or a native OCC error")
+
+        self.jobs += 1
+        if self.jobs >= self.pool.max_jobs_per_worker:
+            self._recycle("max_jobs")
+        return outcome
+
+    def _loop(self) -> None:
+        while True:
+            # only a warm worker takes jobs, so no job waits on a cold start while another worker is idle
+            if not self._wait_ready():
+                print(f"Execution worker {self.index} failed to start, retrying")
+                self._recycle("crashes")
+                time.sleep(1.0)
+                continue
+
+            job = self.pool._queue.get()
+            if job is None:
+                self._stop()
+                return
+            future, prog, submitted_at = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                outcome = self._run(prog)
+            except Exception as e:  # pipe errors etc.: never leave the caller waiting
+                self._kill()
+                self._spawn()
+                future.set_exception(e)
+                continue
+            finally:
+                self.pool._record(started_at - submitted_at, time.perf_counter() - started_at)
+            future.set_result(outcome)
+
+
+class ExecutionPool:
+    def __init__(self, size: int = EXEC_POOL_SIZE, max_jobs_per_worker: int = EXEC_MAX_JOBS_PER_WORKER,
+                 wall_seconds: float = EXEC_WALL_SECONDS, cpu_seconds: int = EXEC_CPU_SECONDS,
+                 memory_mb: int = EXEC_MEMORY_MB):
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "completed": 0, "timeouts": 0, "crashes": 0, "max_jobs": 0}
+        self._wait_s: deque = deque(maxlen=1000)
+        self._run_s: deque = deque(maxlen=1000)
+        self._workers: List[_Worker] = []
+        self.ensure_workers(size)
+
+    def ensure_workers(self, size: int) -> None:
+        """Grow the pool to at least `size` workers (e.g. for best-of-N validation)."""
+        with self._lock:
+            while len(self._workers) < size:
+                self._workers.append(_Worker(self, len(self._workers)))
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has finished its start-up imports."""
+        with self._lock:
+            workers = list(self._workers)
+        return all(worker.ready.wait(timeout) for worker in workers)
+
+    def submit(self, prog: str) -> Future:
+        future: Future = Future()
+        cache = get_execution_cache()
+        cached = cache.get(prog)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        future.add_done_callback(lambda f: f.cancelled() or f.exception() or cache.put(prog, f.result()))
+        with self._lock:
+            self._counters["submitted"] += 1
+        self._queue.put((future, prog, time.perf_counter()))
+        return future
+
+    def run(self, prog: str) -> Dict[str, Any]:
+        return self.submit(prog).result()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _record(self, wait_s: float, run_s: float) -> None:
+        with self._lock:
+            self._counters["completed"] += 1
+            self._wait_s.append(wait_s)
+            self._run_s.append(run_s)
+
+    def stats(self) -> Dict[str, Any]:
+        def pct(values: Iterable[float], q: float) -> float:
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4) if ordered else 0.0
+
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "queued": self._queue.qsize(),
+                **self._counters,
+                "recycled": self._counters["max_jobs"] + self._counters["timeouts"] + self._counters["crashes"],
+                "queue_wait_p50_s": pct(self._wait_s, 0.5),
+                "queue_wait_p95_s": pct(self._wait_s, 0.95),
+                "run_p50_s": pct(self._run_s, 0.5),
+                "run_p95_s": pct(self._run_s, 0.95),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.thread.join(timeout=10)
+
+
+_pool: Optional[ExecutionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_execution_pool(min_workers: int = 0) -> ExecutionPool:
+    """Process-wide pool, started on first use (call once at start-up to pre-fork the workers)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExecutionPool(size=max(EXEC_POOL_SIZE, min_workers))
+            atexit.register(_pool.shutdown)
+    if min_workers:
+        _pool.ensure_workers(min_workers)
+    return _pool
+
@@ -1,5 +1,7 @@
-from typing import Annotated, List, Union, TypedDict, Optional
+from typing import Annotated, Dict, List, Union, TypedDict, Optional
 
+from graph.artifacts import ModelArtifacts
+from graph.geometry import GeometryReport
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
@@ -29,9 +31,16 @@ class CADState(TypedDict):
     LangGraph state model
     """
     messages: Annotated[List[Union[HumanMessage, AIMessage]], add_messages]
+
+    # per-run workspace (see graph.workspace)
+    run_id: str
+    output_dir: str  # exported artifacts of this run
+
     human_messages: List[str]
     dimensions: dict
     design_instructions: List[str]
+    object_name: str
+    object_summary: str
     cadquery_context: str
     design_summary: str
     cadquery_program: str
@@ -43,6 +52,21 @@ class CADState(TypedDict):
 
     # code validation
     code_insights: CodeInsights
+    prevalidated_program: Optional[str]  # already validated by best-of-N generation
+
+    # best-of-N generation
+    n_candidates: int
+    candidate_stats: List[dict]
+
+    # B-Rep checks of the executed model (see graph.geometry)
+    geometry: Optional[GeometryReport]
+
+    # validated model, tessellated / serialized in memory
+    artifacts: Optional[ModelArtifacts]
+    render_views: Optional[Dict[str, bytes]]  # view name -> PNG, as the critique reviewed them
+
+    # files written for the kept design: extension -> path in `output_dir`
+    exported_files: Dict[str, str]
 
     # iteration tracker
     current_iter: int
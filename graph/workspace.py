@@ -0,0 +1,27 @@
+"""
+Per-run workspaces.
+
+Every graph run gets its own artifact namespace `RUNS_DIR/<run_id>/` (exported `object.stl` / `object.step`, the
+rendered views). The path travels in `CADState`, and programs are validated with their exports captured in memory
+(see `graph.execution`), so no stage touches the process working directory and concurrent runs never clobber each
+other's files.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+RUNS_DIR = os.getenv("RUNS_DIR", "output")
+
+
+def new_run_id() -> str:
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def start_run(state):
+    """Graph node: a fresh run id and directory for this invocation (each REPL turn is its own run)."""
+    run_id = new_run_id()
+    output_dir = Path(RUNS_DIR) / run_id
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return {"run_id": run_id, "output_dir": str(output_dir)}
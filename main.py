@@ -9,30 +9,50 @@ example_prompts:
 
 from rich.traceback import install
 from dotenv import load_dotenv
+from graph.artifacts import wait_for_exports
 from graph.graph import build_graph
+from graph.sandbox import EXEC_SANDBOX, get_execution_pool
 from langchain_core.messages import HumanMessage
+from utils.tracing import TraceHandler
 
 install(show_locals=False)
 load_dotenv(".env")
 
-graph = build_graph()
-state = {"messages": []}
 
-while True:
-    user = input("User: ")
-    if user == "exit":
-        break
-
-    state["messages"] += [HumanMessage(content=user)]
-    result = graph.invoke(state, {"recursion_limit": 20})
-
-    # print(result.keys())
-    print("▶︎ Design dimensions: \n", result.get("dimensions"), end="\n-----------")
-    print("▶︎ Design instructions: \n", result.get("design_instructions"), end="\n-----------")
-    print("▶︎ Program: \n", result.get("cadquery_program"), end="\n-----------")
-    print("▶︎ Code validation status: \n", result.get("code_insights")['is_code_valid'], end="\n-----------")
-    print("▶︎ Design critique: \n", result.get("design_critique"), end="\n-----------")
-    print("\n")
-
-    # state updates propagate automatically
-    state = result
+def main():
+    graph = build_graph()
+    state = {"messages": []}
+    if EXEC_SANDBOX:
+        get_execution_pool()  # pre-fork the execution workers: their cadquery import overlaps the first LLM calls
+
+    while True:
+        user = input("User: ")
+        if user == "exit":
+            break
+
+        state["messages"] += [HumanMessage(content=user)]
+        tracer = TraceHandler()
+        result = graph.invoke(state, {"recursion_limit": 20, "callbacks": [tracer]})
+        # the STEP file is written in the background (EXPORT_IN_BACKGROUND): finish it before reporting the artifacts
+        wait_for_exports()
+
+        # print(result.keys())
+        print("▶︎ Design dimensions: \n", result.get("dimensions"), end="\n-----------")
+        print("▶︎ Design instructions: \n", result.get("design_instructions"), end="\n-----------")
+        print("▶︎ Program: \n", result.get("cadquery_program"), end="\n-----------")
+        print("▶︎ Code validation status: \n", result.get("is_code_valid"), end="\n-----------")
+        print("▶︎ Design critique: \n", result.get("design_critique"), end="\n-----------")
+        print(f"▶︎ Artifacts: {result.get('output_dir')}")
+        print(f"▶︎ Trace: {tracer.path}")
+        print("\n")
+
+        # state updates propagate automatically
+        state = result
+
+
+# guarded: worker processes (best-of-N validation) re-import this module on start-up
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        wait_for_exports()  # an interrupted session doesn't leave a half-written STEP file behind
@@ -0,0 +1,158 @@
+"""
+Incremental parsing of a streamed LLM code completion.
+
+Tokens are fed as they arrive; markdown fences are stripped on the fly and every completed line is syntax-checked
+against the program so far. Lines before the opening fence may be a prose preamble ("Here is the program:"): they
+are buffered unchecked until the fence drops them, and only when `grace_lines` + 1 non-blank lines go by without a
+fence is the response taken for bare code and checked from its first line. A prefix that is merely *incomplete*
+(open block, open bracket, unterminated string) is fine; a prefix that is *invalid* and stays invalid for
+`grace_lines` more lines (e.g. prose instead of code) raises `UnrecoverableProgramError`, so the caller can abort
+the completion instead of paying for the rest of it.
+"""
+
+import codeop
+import warnings
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ensure_config, merge_configs
+
+
+class UnrecoverableProgramError(ValueError):
+    def __init__(self, msg: str, line_no: Optional[int], program: str):
+        super().__init__(msg)
+        self.line_no = line_no
+        self.program = program
+
+
+class StreamingProgramParser:
+    def __init__(self, grace_lines: int = 2):
+        self.grace_lines = grace_lines
+        self.lines: List[str] = []
+        self.is_closed = False  # closing fence seen, everything after it is ignored
+        self.streamed = False  # any chunk fed
+
+        self._pending = ""
+        self._preamble: List[str] = []  # lines before the opening fence, or before deciding the code is bare
+        self._started = False
+        self._fenced = False
+        self._error: Optional[SyntaxError] = None
+        self._error_at = 0  # number of lines when the current error was first seen
+
+    @property
+    def program(self) -> str:
+        return "\n".join(self.lines).strip()
+
+    def feed(self, chunk: str) -> None:
+        self.streamed = True
+        if self.is_closed:
+            return
+
+        self._pending += chunk
+        *complete, self._pending = self._pending.split("\n")
+        for line in complete:
+            self._add_line(line)
+            if self.is_closed:
+                return
+
+    def finish(self) -> str:
+        """Flush the last (unterminated) line and return the program with fences removed."""
+        if self._pending and not self.is_closed:
+            line, self._pending = self._pending, ""
+            if not line.strip().startswith("```"):
+                (self.lines if self._started else self._preamble).append(line)
+        if not self._started:  # a short unfenced response: bare code, left to validation
+            self.lines, self._preamble = self._preamble, []
+        return self.program
+
+    def _add_line(self, line: str) -> None:
+        stripped = line.strip()
+
+        if not self._started:
+            if stripped.startswith("```"):  # opening fence, e.g. ```python: drop any prose preamble
+                self._started, self._fenced, self._preamble = True, True, []
+                return
+            self._preamble.append(line)
+            if sum(bool(line.strip()) for line in self._preamble) > self.grace_lines:
+                self._start_bare()
+            return
+
+        if stripped.startswith("```"):
+            if not self._fenced and self._error is not None:
+                # prose preamble ("Here is the code:") followed by the opening fence: drop the preamble
+                self.lines, self._fenced, self._error = [], True, None
+                return
+            self.is_closed = True  # closing fence
+            return
+
+        self.lines.append(line)
+        self._check()
+
+    def _start_bare(self) -> None:
+        """No fence within the grace window: the response is bare code, checked line by line from its start."""
+        self._started, preamble, self._preamble = True, self._preamble, []
+        for line in preamble:
+            self.lines.append(line)
+            self._check()
+
+    def _check(self) -> None:
+        source = "\n".join(self.lines) + "\n"
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                codeop.compile_command(source, symbol="exec")  # None -> incomplete but still valid so far
+        except (SyntaxError, ValueError, OverflowError) as e:
+            if self._error is None:
+                self._error, self._error_at = e, len(self.lines)
+            if len(self.lines) - self._error_at >= self.grace_lines:
+                line_no = getattr(self._error, "lineno", None)
+                raise UnrecoverableProgramError(
+                    f"SyntaxError at line {line_no}: {getattr(self._error, 'msg', self._error)}",
+                    line_no=line_no,
+                    program=self.program,
+                )
+            return
+
+        self._error = None
+
+
+class ProgramStreamHandler(BaseCallbackHandler):
+    """Feeds streamed tokens into a `StreamingProgramParser`; its errors abort the LLM call."""
+
+    raise_error = True
+    run_inline = True  # async runs: call from the event loop instead of hopping to an executor thread
+
+    def __init__(self, parser: StreamingProgramParser):
+        self.parser = parser
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.parser.feed(token)
+
+
+def _with_handler(parser: StreamingProgramParser) -> RunnableConfig:
+    # added to the ambient (graph node) config, so outer callbacks such as tracing still see the call
+    return merge_configs(ensure_config(), {"callbacks": [ProgramStreamHandler(parser)]})
+
+
+def stream_program(chain: Runnable, variables: dict, grace_lines: int = 2) -> str:
+    """
+    Invoke a prompt | llm chain with token streaming and return the fence-stripped program.
+    Raises `UnrecoverableProgramError` as soon as the partial program can no longer become valid Python.
+    """
+    parser = StreamingProgramParser(grace_lines=grace_lines)
+    response = chain.invoke(variables, config=_with_handler(parser))
+    return _finish(parser, response)
+
+
+async def astream_program(chain: Runnable, variables: dict, grace_lines: int = 2) -> str:
+    """Async variant of `stream_program`."""
+    parser = StreamingProgramParser(grace_lines=grace_lines)
+    response = await chain.ainvoke(variables, config=_with_handler(parser))
+    return _finish(parser, response)
+
+
+def _finish(parser: StreamingProgramParser, response) -> str:
+    if not parser.streamed:  # cache hit: nothing was streamed, parse the whole response at once
+        parser.feed(response.content + "\n")
+    return parser.finish()
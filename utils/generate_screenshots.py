@@ -1,17 +1,31 @@
 """
-Generate screenshots of an object in STL file from 4 different angles.
+Generate screenshots of an object (STL file or in-memory mesh) from 4 different angles.
 Optionally return as base64 encoded string.
+
+Views are rendered by the NumPy z-buffer rasterizer in `utils.rasterizer`; the original matplotlib `plot_trisurf`
+renderer is kept as `render_views_matplotlib` for comparison (see `benchmarks/bench_render.py`).
 """
 
 import base64
+import time
+from functools import lru_cache
 from io import BytesIO
 from typing import Dict, Tuple, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401  (registers the 3d projection)
+from PIL import Image, ImageDraw, ImageFont
 import trimesh
 from trimesh import Trimesh
 
+from utils.decimate import RENDER_TRIANGLE_BUDGET, decimate
+from utils.rasterizer import Camera, face_normals, fit_scale, mesh_edges, render_shaded
+
+# encoder name -> (PIL format, save options)
+IMAGE_FORMATS = {"png": ("PNG", {}), "jpeg": ("JPEG", {}), "webp": ("WEBP", {}),
+                 "webp-lossless": ("WEBP", {"lossless": True})}
+
 
 def load_stl(filepath: str) -> Trimesh:
     """Load STL file and return trimesh object."""
@@ -68,6 +82,116 @@ def plot_mesh_view(ax, mesh: Trimesh, angles: Dict[str, float],
                         edgecolor='black', alpha=0.8, linewidth=1.5))
 
 
+@lru_cache(maxsize=None)
+def _font(font_px: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(size=font_px)
+
+
+def _label(image: Image.Image, text: str, font_px: int) -> None:
+    draw = ImageDraw.Draw(image)
+    font = _font(font_px)
+    pad = font_px // 3
+    left, top, right, bottom = draw.textbbox((2 * pad, 2 * pad), text, font=font)
+    draw.rounded_rectangle((left - pad, top - pad, right + pad, bottom + pad), radius=pad, fill="white",
+                           outline="black", width=max(1, font_px // 12))
+    draw.text((2 * pad, 2 * pad), text, fill="black", font=font)
+
+
+def render_view_images(vertices: np.ndarray, faces: np.ndarray, panel_size: Tuple[int, int],
+                       line_width: int = 1) -> Dict[str, np.ndarray]:
+    """One (height, width, 3) image per view, all at the same scale, outlined by feature edges and silhouettes."""
+    normals = face_normals(vertices, faces)
+    edges = mesh_edges(vertices, faces, normals)
+    center, scale = fit_scale(vertices, panel_size)
+    return {name: render_shaded(vertices, faces, Camera(angles["elev"], angles["azim"], center, scale), panel_size,
+                                normals=normals, edges=edges, line_width=line_width)
+            for name, angles in get_view_angles().items()}
+
+
+def _render_mesh(mesh: Trimesh, triangle_budget: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(vertices, faces) to render: the mesh's own, or decimated to `triangle_budget` triangles (0: never)."""
+    vertices, faces = np.asarray(mesh.vertices, dtype=np.float64), np.asarray(mesh.faces)
+    if 0 < triangle_budget < len(faces):
+        start = time.perf_counter()
+        vertices, faces = decimate(vertices, faces, triangle_budget)
+        print(f"Decimated {len(mesh.faces)} -> {len(faces)} triangles for rendering "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return vertices, faces
+
+
+def _labelled_views(mesh: Trimesh, panel: Tuple[int, int], dpi: float,
+                    triangle_budget: int) -> Dict[str, Image.Image]:
+    """One labelled image per view; line width and label size follow `dpi` like the matplotlib figure's did."""
+    vertices, faces = _render_mesh(mesh, triangle_budget)
+    views = {}
+    for name, pixels in render_view_images(vertices, faces, panel, max(1, round(dpi / 100))).items():
+        views[name] = Image.fromarray(pixels)
+        _label(views[name], name, font_px=round(18 * dpi / 72))
+    return views
+
+
+def encode_image(image: Image.Image, fmt: str = "png", quality: int = 80) -> bytes:
+    """Image bytes in one of `IMAGE_FORMATS` (`quality` applies to the lossy ones)."""
+    pil_format, options = IMAGE_FORMATS[fmt]
+    if pil_format != "PNG" and not options.get("lossless"):
+        options = {**options, "quality": quality}
+    buffer = BytesIO()
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def tile_views(views: Dict[str, Image.Image]) -> Image.Image:
+    """The views tiled 2x2, in `get_view_angles()` order."""
+    width, height = next(iter(views.values())).size
+    composite = Image.new(next(iter(views.values())).mode, (2 * width, 2 * height), "white")
+    for idx, view in enumerate(views.values()):
+        composite.paste(view, ((idx % 2) * width, (idx // 2) * height))
+    return composite
+
+
+def render_views(mesh: Trimesh, fig_size: Tuple[int, int] = (12, 12), dpi: int = 150,
+                 triangle_budget: int = RENDER_TRIANGLE_BUDGET) -> bytes:
+    """
+    Render the 2x2 ISO / FRONT / TOP / SIDE composite of a mesh (`fig_size` inches at `dpi`) as PNG bytes.
+    Meshes over `triangle_budget` triangles are decimated first (0: always render at full resolution).
+    """
+    panel = (int(fig_size[0] * dpi) // 2, int(fig_size[1] * dpi) // 2)
+    return encode_image(tile_views(_labelled_views(mesh, panel, dpi, triangle_budget)))
+
+
+def render_labelled_views(mesh: Trimesh, size: int = 512,
+                          triangle_budget: int = RENDER_TRIANGLE_BUDGET) -> Dict[str, Image.Image]:
+    """One `size` x `size` image per view (labelled as in the composite), in `get_view_angles()` order."""
+    # a composite panel is half of a 12 inch figure: `size` px at dpi = size / 6
+    return _labelled_views(mesh, (size, size), size / 6, triangle_budget)
+
+
+def compose_views(encoded: Dict[str, bytes]) -> bytes:
+    """PNG of encoded views (any `IMAGE_FORMATS`): tiled 2x2, or as is if they already are a composite."""
+    views = {name: Image.open(BytesIO(data)) for name, data in encoded.items()}
+    return encode_image(tile_views(views) if len(views) > 1 else next(iter(views.values())))
+
+
+def render_views_matplotlib(mesh: Trimesh, fig_size: Tuple[int, int] = (12, 12), dpi: int = 150) -> bytes:
+    """The original composite, drawn with matplotlib's `plot_trisurf` (slow on large meshes)."""
+    views = get_view_angles()
+    max_range, mid = calculate_bounds(mesh)
+
+    # a standalone Figure instead of pyplot's global current figure, so concurrent runs can render in threads
+    fig = Figure(figsize=fig_size)
+    fig.patch.set_facecolor('white')
+
+    for idx, (name, angles) in enumerate(views.items(), 1):
+        ax = fig.add_subplot(2, 2, idx, projection='3d')
+        plot_mesh_view(ax, mesh, angles, max_range, mid, name)
+
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
+    return buffer.getvalue()
+
+
 def generate_stl_screenshots(
         stl_filepath: str,
         output_filepath: Optional[str] = None,
@@ -88,33 +212,14 @@ def generate_stl_screenshots(
     Returns:
         Base64 encoded string if return_base64=True, else None
     """
-    mesh = load_stl(stl_filepath)
-    views = get_view_angles()
-    max_range, mid = calculate_bounds(mesh)
-
-    fig = plt.figure(figsize=fig_size)
-    fig.patch.set_facecolor('white')
-
-    for idx, (name, angles) in enumerate(views.items(), 1):
-        ax = fig.add_subplot(2, 2, idx, projection='3d')
-        plot_mesh_view(ax, mesh, angles, max_range, mid, name)
-
-    plt.tight_layout()
-
-    result = None
-
-    if return_base64:
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
-        buffer.seek(0)
-        result = base64.b64encode(buffer.read()).decode('utf-8')
+    png = render_views(load_stl(stl_filepath), fig_size=fig_size, dpi=dpi)
 
     if output_filepath:
-        plt.savefig(output_filepath, dpi=dpi, bbox_inches='tight', facecolor='white')
+        with open(output_filepath, "wb") as fp:
+            fp.write(png)
         print(f"Screenshot saved as {output_filepath}")
 
-    plt.close()
-    return result
+    return base64.b64encode(png).decode('utf-8') if return_base64 else None
 
 
 if __name__ == "__main__":
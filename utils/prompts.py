@@ -0,0 +1,95 @@
+"""
+Registry of the markdown prompt templates in `prompts/`.
+
+All templates are read, brace-escaped and compiled into `ChatPromptTemplate`s once at start-up. Nodes fetch the
+compiled template by name; a template is re-read only when its file's mtime changes (checked at most every
+`RELOAD_CHECK_SECONDS`), so prompt edits still show up without a restart but the hot loop does no file I/O or
+template parsing.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from utils.utils import load_and_format_prompt
+
+PROMPTS_DIR = Path(__file__).resolve().parents[1] / "prompts"
+RELOAD_CHECK_SECONDS = 1.0
+
+
+class _Entry:
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime_ns = path.stat().st_mtime_ns
+        self.text = load_and_format_prompt(path)
+        self.checked_at = time.monotonic()
+        self.templates: Dict[bool, ChatPromptTemplate] = {}
+
+
+class PromptRegistry:
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR, reload_check_seconds: float = RELOAD_CHECK_SECONDS):
+        self.prompts_dir = Path(prompts_dir)
+        self.reload_check_seconds = reload_check_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self.reloads = 0
+
+        for path in sorted(self.prompts_dir.glob("*.md")):
+            entry = _Entry(path)
+            self._entries[path.stem] = entry
+            self.template(path.stem)  # compile eagerly
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._entries)
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if entry is None:
+            path = self.prompts_dir / f"{name}.md"
+            if not path.exists():
+                raise KeyError(f"Unknown prompt `{name}`: {path} does not exist")
+            with self._lock:
+                entry = self._entries.setdefault(name, _Entry(path))
+            return entry
+
+        now = time.monotonic()
+        if now - entry.checked_at < self.reload_check_seconds:
+            return entry
+
+        with self._lock:
+            entry.checked_at = now
+            if entry.path.stat().st_mtime_ns != entry.mtime_ns:
+                entry = self._entries[name] = _Entry(entry.path)
+                self.reloads += 1
+                print(f"Reloaded prompt `{name}`")
+        return entry
+
+    def text(self, name: str) -> str:
+        """Brace-escaped prompt text (template placeholders kept)."""
+        return self._entry(name).text
+
+    def template(self, name: str, with_history: bool = False) -> ChatPromptTemplate:
+        """
+        Compiled system-prompt template. `with_history=True` appends a `messages` placeholder for the conversation.
+        """
+        entry = self._entry(name)
+        template: Optional[ChatPromptTemplate] = entry.templates.get(with_history)
+        if template is None:
+            messages = [("system", entry.text)]
+            if with_history:
+                messages.append(MessagesPlaceholder("messages"))
+            template = entry.templates[with_history] = ChatPromptTemplate.from_messages(messages)
+        return template
+
+
+_registry: Optional[PromptRegistry] = None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
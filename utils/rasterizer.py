@@ -0,0 +1,268 @@
+"""
+Headless software rasterizer for triangle meshes, in batched NumPy.
+
+Orthographic projection, flat Lambert shading and a z-buffer: every triangle is cut into one span of pixel centres per
+row it covers (solved from its edge equations, so no fragment outside it is generated), the spans are expanded into
+fragments with depth from the triangle's plane, and the nearest fragment per pixel wins. Fragments are processed in
+chunks of at most `CHUNK_FRAGMENTS` so memory stays bounded on large meshes.
+
+Instead of every triangle edge, only the lines that carry the shape are drawn on top: sharp feature edges (dihedral
+angle above `FEATURE_ANGLE`, open boundaries, non-manifold edges), found once per mesh from its face adjacency, and
+the silhouette of each view (edges between a face turned towards the camera and one turned away). Lines are sampled
+once per pixel and depth-tested against the shaded image, so hidden edges stay hidden; the outer contour, where
+grazing surfaces defeat a depth test, is traced in image space instead.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+CHUNK_FRAGMENTS = 2_000_000
+AMBIENT = 0.3  # share of the base colour on surfaces facing away from the light
+FEATURE_ANGLE = 30.0  # degrees between adjacent face normals above which their shared edge is drawn
+WELD_TOLERANCE = 1e-6  # of the mesh extent: vertices closer than this are one (B-Rep faces are meshed separately)
+
+
+@dataclass
+class Camera:
+    """Orthographic camera looking at `center` from the direction given by matplotlib-style elevation / azimuth."""
+    elev: float
+    azim: float
+    center: np.ndarray
+    scale: float  # pixels per model unit
+
+    def basis(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(right, up, towards the viewer) unit vectors."""
+        e, a = np.radians(self.elev), np.radians(self.azim)
+        towards = np.array([np.cos(e) * np.cos(a), np.cos(e) * np.sin(a), np.sin(e)])
+        right = np.array([-np.sin(a), np.cos(a), 0.0])
+        return right, np.cross(towards, right), towards
+
+    def project(self, vertices: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+        """(n, 3) model coordinates -> (n, 3) pixel x, pixel y (down), depth (smaller is nearer)."""
+        width, height = size
+        right, up, towards = self.basis()
+        p = vertices - self.center
+        return np.column_stack([
+            width / 2 + (p @ right) * self.scale,
+            height / 2 - (p @ up) * self.scale,
+            -(p @ towards),
+        ])
+
+
+def fit_scale(vertices: np.ndarray, size: Tuple[int, int], margin: float = 0.9) -> Tuple[np.ndarray, float]:
+    """Centre and pixels-per-unit that fit the mesh's bounding sphere in the image, whatever the view direction."""
+    center = (vertices.min(axis=0) + vertices.max(axis=0)) / 2
+    radius = max(float(np.linalg.norm(vertices - center, axis=1).max()), 1e-9)
+    return center, margin * min(size) / (2 * radius)
+
+
+def face_cross(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """(m, 3) cross products of the face edges: normals scaled by twice the face area."""
+    x, y, z = (np.ascontiguousarray(vertices[:, axis])[faces.T] for axis in range(3))
+    ux, uy, uz = x[1] - x[0], y[1] - y[0], z[1] - z[0]
+    vx, vy, vz = x[2] - x[0], y[2] - y[0], z[2] - z[0]
+    return np.column_stack([uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx])
+
+
+def face_normals(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """(m, 3) unit normals; zero for degenerate faces."""
+    normals = face_cross(vertices, faces)
+    lengths = np.linalg.norm(normals, axis=1)
+    return normals / np.where(lengths > 0, lengths, 1)[:, None]
+
+
+def flat_shading(normals: np.ndarray, light: np.ndarray) -> np.ndarray:
+    """Per-face Lambert intensity in [AMBIENT, 1], two-sided (winding need not be consistent)."""
+    return AMBIENT + (1 - AMBIENT) * np.abs(normals @ (light / np.linalg.norm(light)))
+
+
+def weld_vertices(vertices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge vertices closer than `WELD_TOLERANCE` of the mesh extent.
+    Returns (index of one original vertex per welded vertex, welded id of every original vertex).
+    """
+    extent = max(float(np.ptp(vertices, axis=0).max()), 1e-9) if len(vertices) else 1.0
+    grid = np.round((vertices - vertices.min(axis=0, initial=0)) / (extent * WELD_TOLERANCE)).astype(np.int64)
+    cells = int(round(1 / WELD_TOLERANCE)) + 1  # per axis; cells ** 3 fits in an int64
+    _, first, welded = np.unique((grid[:, 0] * cells + grid[:, 1]) * cells + grid[:, 2],
+                                 return_index=True, return_inverse=True)
+    return first, welded.ravel()
+
+
+@dataclass
+class MeshEdges:
+    """Unique edges of a mesh, with the (up to) two faces around each."""
+    segments: np.ndarray  # (k, 2, 3) end points
+    faces: np.ndarray  # (k, 2) adjacent faces; both the same face on open boundaries
+    sharp: np.ndarray  # (k,) feature edge: dihedral angle above the threshold, boundary or non-manifold
+
+    def silhouette(self, normals: np.ndarray, towards: np.ndarray) -> np.ndarray:
+        """(k,) edges between a face turned towards the viewer and one turned away (or seen edge-on)."""
+        facing = normals @ towards > 1e-9
+        return facing[self.faces[:, 0]] != facing[self.faces[:, 1]]
+
+
+def mesh_edges(vertices: np.ndarray, faces: np.ndarray, normals: np.ndarray,
+               feature_angle: float = FEATURE_ANGLE) -> MeshEdges:
+    """Edge adjacency of a triangle soup (coincident vertices welded first), vectorized."""
+    first, welded = weld_vertices(vertices)
+    corners = welded[faces]
+
+    # every (face, side) as one key of its welded vertex ids (lower first), grouped by key
+    start_ids, end_ids = corners.ravel(), corners[:, [1, 2, 0]].ravel()
+    key = np.minimum(start_ids, end_ids) * len(first) + np.maximum(start_ids, end_ids)
+    order = np.argsort(key)
+    key, owner = key[order], order // 3
+    start = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+    count = np.diff(np.append(start, len(key)))
+
+    adjacent = np.column_stack([owner[start], owner[np.where(count > 1, start + 1, start)]])
+    cos_angle = np.einsum("ij,ij->i", normals[adjacent[:, 0]], normals[adjacent[:, 1]])
+    sharp = (count != 2) | (cos_angle < np.cos(np.radians(feature_angle)))
+    ends = np.column_stack([key[start] // len(first), key[start] % len(first)])
+    return MeshEdges(vertices[first][ends], adjacent, sharp)
+
+
+def _expand(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For runs of the given lengths: (run index, position in run) of every element."""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    return owner, np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def rasterize(screen: np.ndarray, faces: np.ndarray, size: Tuple[int, int],
+              depth: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Z-buffer `faces` (indices into the projected vertices `screen`, see `Camera.project`), optionally on top of an
+    existing `depth` buffer. Returns (depth buffer, index of the visible face; -1 where nothing was drawn), each
+    (height, width).
+    """
+    width, height = size
+    zbuf = np.full(height * width, np.inf) if depth is None else depth.ravel().copy()
+    fbuf = np.full(height * width, -1, dtype=np.int64)
+
+    # vertex-major (3, m) coordinates: every per-vertex / per-edge quantity below is a flat array
+    x, y, z = (np.ascontiguousarray(screen[:, axis])[faces.T] for axis in range(3))
+    area = (x[1] - x[0]) * (y[2] - y[0]) - (x[2] - x[0]) * (y[1] - y[0])
+
+    # rows of pixel centres (j + 0.5) each triangle spans
+    y0 = np.clip(np.ceil(np.minimum(np.minimum(y[0], y[1]), y[2]) - 0.5), 0, height).astype(np.int64)
+    y1 = np.clip(np.floor(np.maximum(np.maximum(y[0], y[1]), y[2]) - 0.5), -1, height - 1).astype(np.int64)
+    keep = np.flatnonzero((np.abs(area) > 1e-12) & (y1 >= y0))
+    if not len(keep):
+        return zbuf.reshape(height, width), fbuf.reshape(height, width)
+    x, y, z, area, y0, y1 = x[:, keep], y[:, keep], z[:, keep], area[keep], y0[keep], y1[keep]
+
+    # depth plane z = dz0 + dzdx cx + dzdy cy
+    dzdx = ((z[1] - z[0]) * (y[2] - y[0]) - (z[2] - z[0]) * (y[1] - y[0])) / area
+    dzdy = ((z[2] - z[0]) * (x[1] - x[0]) - (z[1] - z[0]) * (x[2] - x[0])) / area
+    dz0 = z[0] - dzdx * x[0] - dzdy * y[0]
+
+    # Each edge constrains a row's pixel centres cx to one side of the edge's crossing, cx >= / <= k0 + k1 * cy
+    # (which side depends on the edge direction and the winding). Horizontal edges only bound the triangle's rows.
+    nxt, prv = [1, 2, 0], [2, 0, 1]
+    dy = y[nxt] - y[prv]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k0 = (x[prv] * y[nxt] - x[nxt] * y[prv]) / dy
+        k1 = (x[nxt] - x[prv]) / dy
+    a = np.where(area > 0, dy, -dy)
+    lower_k0, lower_k1 = np.where(a > 0, k0, -np.inf), np.where(a > 0, k1, 0.0)
+    upper_k0, upper_k1 = np.where(a < 0, k0, np.inf), np.where(a < 0, k1, 0.0)
+
+    # one span of pixel centres per (triangle, row)
+    row_tri, row_off = _expand(y1 - y0 + 1)
+    cy = (y0[row_tri] + row_off) + 0.5
+    lower = np.maximum.reduce([lower_k0[e][row_tri] + lower_k1[e][row_tri] * cy for e in range(3)])
+    upper = np.minimum.reduce([upper_k0[e][row_tri] + upper_k1[e][row_tri] * cy for e in range(3)])
+
+    eps = 1e-7
+    col0 = np.clip(np.ceil(lower - 0.5 - eps), 0, width).astype(np.int64)
+    col1 = np.clip(np.floor(upper - 0.5 + eps), -1, width - 1).astype(np.int64)
+    spans = np.flatnonzero(col1 >= col0)
+    row_tri, cy, col0, lengths = row_tri[spans], cy[spans], col0[spans], (col1 - col0 + 1)[spans]
+
+    bounds = np.searchsorted(np.cumsum(lengths), np.arange(CHUNK_FRAGMENTS, lengths.sum(), CHUNK_FRAGMENTS))
+    for chunk in np.split(np.arange(len(spans)), bounds):
+        if not len(chunk):
+            continue
+        span, offset = _expand(lengths[chunk])
+        span = chunk[span]
+        t = row_tri[span]
+        px = col0[span] + offset
+        py = (cy[span] - 0.5).astype(np.int64)
+        frag_z = dz0[t] + dzdx[t] * (px + 0.5) + dzdy[t] * cy[span]
+        pixel = py * width + px
+
+        # nearest fragment per pixel: unbuffered minimum into the depth buffer, then the fragments that set it
+        np.minimum.at(zbuf, pixel, frag_z)
+        nearest = frag_z == zbuf[pixel]
+        fbuf[pixel[nearest]] = keep[t[nearest]]
+
+    return zbuf.reshape(height, width), fbuf.reshape(height, width)
+
+
+def draw_lines(image: np.ndarray, depth: np.ndarray, segments: np.ndarray, camera: Camera,
+               color=(0, 0, 0), width: int = 1) -> None:
+    """
+    Draw the visible parts of 3D `segments` (k, 2, 3) into `image` in place, one sample per pixel along each line.
+    A sample is visible over the background, or if it isn't behind the farthest surface drawn around it.
+    """
+    height, image_width = depth.shape
+    if not len(segments):
+        return
+    ends = camera.project(segments.reshape(-1, 3), (image_width, height)).reshape(-1, 2, 3)
+    lengths = np.ceil(np.abs(ends[:, 1, :2] - ends[:, 0, :2]).max(axis=1)).astype(np.int64) + 1
+    line, step = _expand(lengths)
+    t = (step / np.maximum(lengths[line] - 1, 1))[:, None]
+    points = ends[line, 0] + t * (ends[line, 1] - ends[line, 0])
+
+    px, py = np.floor(points[:, 0]).astype(np.int64), np.floor(points[:, 1]).astype(np.int64)
+    inside = (px >= 0) & (px < image_width) & (py >= 0) & (py < height)
+    px, py, pz = px[inside], py[inside], points[inside, 2]
+
+    # farthest surface in the 3x3 neighbourhood: an edge between two faces is never behind both of them
+    padded = np.pad(np.where(np.isinf(depth), -np.inf, depth), 1, constant_values=-np.inf)
+    farthest = np.maximum.reduce([padded[dy:dy + height, dx:dx + image_width]
+                                  for dy in range(3) for dx in range(3)])
+    visible = np.isinf(depth[py, px]) | (pz <= farthest[py, px] + 1.0 / camera.scale)  # + a pixel, in model units
+    px, py = px[visible], py[visible]
+
+    for dy in range(width):
+        for dx in range(width):
+            image[np.minimum(py + dy, height - 1), np.minimum(px + dx, image_width - 1)] = color
+
+
+def outline(face_ids: np.ndarray, width: int = 1) -> np.ndarray:
+    """(height, width) mask of drawn pixels within `width` pixels of the background: the view's outer contour."""
+    background = np.pad(face_ids < 0, width, constant_values=True)
+    height, image_width = face_ids.shape
+    near = np.logical_or.reduce([background[width + dy:width + dy + height, width + dx:width + dx + image_width]
+                                 for dy in range(-width, width + 1) for dx in range(-width, width + 1)])
+    return near & (face_ids >= 0)
+
+
+def render_shaded(vertices: np.ndarray, faces: np.ndarray, camera: Camera, size: Tuple[int, int],
+                  normals: Optional[np.ndarray] = None, edges: Optional[MeshEdges] = None, line_width: int = 1,
+                  color=(211, 211, 211), background=(255, 255, 255)) -> np.ndarray:
+    """
+    Flat-shaded view of a mesh as an (height, width, 3) uint8 image, with its feature edges and silhouette drawn if
+    `edges` (see `mesh_edges`) are given. Pass `normals` / `edges` when rendering several views of the same mesh.
+    """
+    vertices = vertices.astype(np.float64)
+    if normals is None:
+        normals = face_normals(vertices, faces)
+    right, up, towards = camera.basis()
+    shade = flat_shading(normals, towards + 0.4 * up - 0.3 * right)  # key light above-left of the viewer
+
+    screen = camera.project(vertices, size)
+    depth, face_ids = rasterize(screen, faces, size)
+
+    # per-face colours, background last so that face id -1 (nothing drawn) picks it
+    palette = np.vstack([shade[:, None] * np.asarray(color, dtype=np.float64), background]).astype(np.uint8)
+    image = palette[face_ids]
+    if edges is not None:
+        lines = edges.sharp | edges.silhouette(normals, towards)
+        draw_lines(image, depth, edges.segments[lines], camera, width=line_width)
+        image[outline(face_ids, line_width)] = 0
+    return image
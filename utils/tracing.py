@@ -0,0 +1,238 @@
+"""
+Structured per-run tracing of the graph: one span per node execution and per LLM call, written as JSONL.
+
+Attach a `TraceHandler` as a callback when invoking the graph (see `main.py`):
+
+    graph.invoke(state, {"callbacks": [TraceHandler()]})
+
+Node spans carry wall time, the node's visit number in the run (loop iteration) and its outcome (validation flags or
+the error), plus triangle count and meshing time for nodes that produced a tessellated model; LLM spans carry wall
+time, model, prompt/completion tokens, estimated cost and whether the response came from the response cache.
+Summarise one or more runs with:
+
+    python -m utils.tracing summary traces/*.jsonl
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+# USD per 1M tokens (input, output)
+PRICING: Dict[str, tuple] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+
+# state keys that describe how a node went, in order of preference
+OUTCOME_KEYS = ("is_code_valid", "is_review_passed", "validation_status")
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    if not model:
+        return None
+    # longest matching prefix, so dated snapshots ("gpt-4o-2024-08-06") price like their family
+    family = max((name for name in PRICING if model.startswith(name)), key=len, default=None)
+    if family is None:
+        return None
+    price_in, price_out = PRICING[family]
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+
+def _mesh_fields(outputs: Any) -> Dict[str, Any]:
+    artifacts = outputs.get("artifacts") if isinstance(outputs, dict) else None
+    if getattr(artifacts, "mesh_s", None) is None:
+        return {}
+    return {"triangles": artifacts.n_triangles, "mesh_s": round(artifacts.mesh_s, 6)}
+
+
+def _outcome(outputs: Any) -> Optional[str]:
+    if not isinstance(outputs, dict):
+        return None
+    for key in OUTCOME_KEYS:
+        if key in outputs:
+            return f"{key}={outputs[key]}"
+    return "ok"
+
+
+class TraceHandler(BaseCallbackHandler):
+    run_inline = True  # async runs: record timestamps on the event loop, not on an executor thread
+
+    def __init__(self, run_id: Optional[str] = None, trace_dir: str = TRACE_DIR):
+        self.run_id = run_id or f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.path = Path(trace_dir) / f"{self.run_id}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, Dict[str, Any]] = {}
+        self._visits: Counter = Counter()
+
+    # ----------------------------
+    # span bookkeeping
+    # ----------------------------
+    def _start(self, run_id: UUID, span: Dict[str, Any]) -> None:
+        span.update(run=self.run_id, start=time.time(), _t0=time.perf_counter())
+        with self._lock:
+            self._open[run_id] = span
+
+    def _end(self, run_id: UUID, **fields: Any) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        span["wall_s"] = round(time.perf_counter() - span.pop("_t0"), 6)
+        span.update(fields)
+        line = json.dumps(span, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fp:
+                fp.write(line + "\n")
+
+    # ----------------------------
+    # graph + node spans
+    # ----------------------------
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+
+        if parent_run_id is None:
+            self._start(run_id, {"type": "graph", "name": kwargs.get("name") or "graph"})
+        elif node and kwargs.get("name") == node:  # the node itself, not a runnable inside it
+            with self._lock:
+                self._visits[node] += 1
+                iteration = self._visits[node]
+            self._start(run_id, {"type": "node", "name": node, "iteration": iteration,
+                                 "step": metadata.get("langgraph_step")})
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, outcome=_outcome(outputs), **_mesh_fields(outputs))
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, outcome="error", error=f"{type(error).__name__}: {error}")
+
+    # ----------------------------
+    # LLM spans
+    # ----------------------------
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        node = metadata.get("langgraph_node")
+        with self._lock:
+            iteration = self._visits.get(node, 0) if node else None
+        self._start(run_id, {"type": "llm", "name": node or "llm", "iteration": iteration,
+                             "model": metadata.get("ls_model_name") or params.get("model") or params.get("model_name")})
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt_tokens = completion_tokens = 0
+        cache_hit = False
+        for generations in response.generations:
+            for gen in generations:
+                message = getattr(gen, "message", None)
+                if message is None:
+                    continue
+                usage = getattr(message, "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                cache_hit = cache_hit or bool(message.response_metadata.get("cache_hit"))
+
+        with self._lock:
+            model = self._open.get(run_id, {}).get("model")
+        cost = 0.0 if cache_hit else estimate_cost(model, prompt_tokens, completion_tokens)
+        self._end(run_id, outcome="ok", prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                  cache_hit=cache_hit, cost_usd=cost)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, outcome="error", error=f"{type(error).__name__}: {error}")
+
+
+# ----------------------------
+# summary CLI
+# ----------------------------
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    rank = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fp:
+            spans.extend(json.loads(line) for line in fp if line.strip())
+    return spans
+
+
+def summarize(spans: List[Dict[str, Any]]) -> str:
+    rows = []
+    runs = {s["run"] for s in spans}
+
+    by_name: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        by_name[(span["type"], span["name"])].append(span)
+
+    header = f"{'type':<6}{'name':<26}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'total s':>10}"
+    rows.append(f"{len(spans)} spans from {len(runs)} run(s)\n")
+    rows.append(header)
+    rows.append("-" * len(header))
+    for span_type in ("graph", "node", "llm"):
+        for (kind, name), group in sorted(by_name.items()):
+            if kind != span_type:
+                continue
+            walls = sorted(s["wall_s"] for s in group)
+            rows.append(f"{kind:<6}{name:<26}{len(walls):>7}{_percentile(walls, 0.5):>9.3f}"
+                        f"{_percentile(walls, 0.95):>9.3f}{sum(walls):>10.2f}")
+
+    llm = [s for s in spans if s["type"] == "llm"]
+    if llm:
+        hits = sum(bool(s.get("cache_hit")) for s in llm)
+        rows.append("")
+        rows.append(f"LLM calls: {len(llm)}  cache hits: {hits} ({hits / len(llm):.0%})  "
+                    f"prompt tokens: {sum(s.get('prompt_tokens', 0) for s in llm)}  "
+                    f"completion tokens: {sum(s.get('completion_tokens', 0) for s in llm)}  "
+                    f"cost: ${sum(s.get('cost_usd') or 0 for s in llm):.4f}")
+
+    meshes = [s for s in spans if s["type"] == "node" and "triangles" in s]
+    if meshes:
+        triangles = sorted(s["triangles"] for s in meshes)
+        mesh_s = sorted(s["mesh_s"] for s in meshes)
+        rows.append(f"meshes: {len(meshes)}  triangles p50: {_percentile(triangles, 0.5):.0f}  "
+                    f"max: {triangles[-1]}  meshing p50: {_percentile(mesh_s, 0.5):.3f}s  "
+                    f"p95: {_percentile(mesh_s, 0.95):.3f}s")
+
+    errors = [s for s in spans if s.get("outcome") == "error"]
+    if errors:
+        rows.append(f"errors: {len(errors)} ({', '.join(sorted({s['name'] for s in errors}))})")
+
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph trace tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="p50/p95 wall time per node and LLM call")
+    summary.add_argument("paths", nargs="+", help="trace JSONL files")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print(summarize(load_spans(args.paths)))
+
+
+if __name__ == "__main__":
+    main()
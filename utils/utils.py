@@ -60,9 +60,11 @@ def replace_curly_braces(t: str):
     Simple fix: escape all { and } inside the prompt by doubling them
     { → {{
     } → }}
+    Placeholders meant to be filled in (`{identifier}` on its own, e.g. `{error_stack}`) are kept as-is.
     """
     t = t.replace("{", "{{")
     t = t.replace('}', '}}')
+    t = re.sub(r"(?<!\{)\{\{([A-Za-z_][A-Za-z0-9_]*)\}\}(?!\})", r"{\1}", t)
     return t
 
 
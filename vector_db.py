@@ -8,10 +8,11 @@ from typing import List
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from tqdm import tqdm
 
+from graph.llm import EMBEDDING_MODEL, get_embeddings
+
 
 class CadQueryKnowledgeBase:
     """
@@ -21,12 +22,19 @@ class CadQueryKnowledgeBase:
 
     VECTOR_DB_DIR = "./chroma_cadquery"
     COLLECTION_NAME = "cadquery_knowledge"
+    EMBEDDING_MODEL = EMBEDDING_MODEL
 
     def __init__(self):
-        embedding = OpenAIEmbeddings(model="text-embedding-3-large")
+        # registered embeddings (see `graph.llm.register_embeddings`); cached OpenAI embeddings by default
+        model, embedding = get_embeddings()
+
+        # vectors of other embedding models (e.g. offline fakes) have other sizes: keep them in their own collection
+        collection_name = self.COLLECTION_NAME
+        if model != self.EMBEDDING_MODEL:
+            collection_name = f"{self.COLLECTION_NAME}-{model}"
 
         self.vectordb = Chroma(
-            collection_name=self.COLLECTION_NAME,
+            collection_name=collection_name,
             embedding_function=embedding,
             persist_directory=self.VECTOR_DB_DIR,
         )